@@ -0,0 +1,23 @@
+"""
+Benchmarks for InventoryCollator.
+
+Run from the repository root as modules, e.g.
+
+    python -m benchmarks.fadvise_latency --help
+
+    fadvise_latency   DB write latency while hashing, with / without fadvise
+    synthetic_drive   reproducible synthetic drive trees
+    scan_throughput   end-to-end Scanner throughput, first scan vs rescan
+    db_ops            Database method microbenchmarks at 100k-5M rows
+
+Importing the package puts inventory_app on sys.path, so benchmark
+modules use the same flat imports as the application.
+"""
+
+import os
+import sys
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "inventory_app")
+
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
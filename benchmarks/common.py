@@ -0,0 +1,83 @@
+import os
+import json
+import math
+import logging
+
+
+# --------------------------------------------------
+# Statistics
+# --------------------------------------------------
+
+def percentile(values, pct: float) -> float:
+    """
+    Nearest-rank percentile of a list of numbers (0.0 when empty).
+    """
+
+    if not values:
+        return 0.0
+
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def latency_summary(latencies_ms) -> dict:
+    return {
+        "count": len(latencies_ms),
+        "p50_ms": round(percentile(latencies_ms, 50), 3),
+        "p99_ms": round(percentile(latencies_ms, 99), 3),
+        "max_ms": round(max(latencies_ms, default=0.0), 3),
+    }
+
+
+# --------------------------------------------------
+# Page Cache
+# --------------------------------------------------
+
+def page_cache_bytes() -> int | None:
+    try:
+        with open("/proc/meminfo", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("Cached:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def drop_from_cache(path: str):
+    """
+    Asks the kernel to drop a file's pages from the page cache (best
+    effort, no-op without posix_fadvise).
+    """
+
+    if not hasattr(os, "posix_fadvise"):
+        return
+
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+
+
+# --------------------------------------------------
+# Reporting
+# --------------------------------------------------
+
+def write_report(report: dict, path: str | None):
+    """
+    Prints the report as JSON and, if path is given, writes it there.
+    """
+
+    text = json.dumps(report, indent=2)
+    print(text)
+
+    if path:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        logging.info(f"Report written to {path}")
+
+
+def setup_benchmark_logging():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
@@ -0,0 +1,404 @@
+"""
+Database method microbenchmarks on pre-populated databases.
+
+For each --rows size (default 100k, 1M and 5M files spread over
+--drives drives, most with a metadata row) a database is populated
+through write_file_batch, then every operation is timed call by call:
+
+    get_drive_id_by_key     drive lookup
+    upsert_file             half updates of existing rows, half new rows
+    insert_path_components  half no-op relinks, half moves to a new directory
+    upsert_audio_metadata   replace the metadata of existing rows
+    write_file_batch        batches of BATCH_COMMIT_SIZE rows, as scans write
+    mark_all_files_missing  whole-drive status reset (legacy)
+    finalize_missing_files  whole-drive status update by scan generation
+
+Each reports ops/s, p50/p99/max latency and how much the database file
+(with its WAL, checkpointed first) grew. Populated databases can be kept
+in --cache-dir and are copied from there on later runs.
+
+Regression mode: with --baseline (an earlier --json report), every
+operation whose ops/s dropped or whose p99 rose by more than
+--threshold (default 25%) is reported as a regression and the run exits
+with status 1. p99 rises below --min-p99-delta-ms are taken as noise.
+
+    python -m benchmarks.db_ops --rows 100k 1M --json db_ops.json
+    python -m benchmarks.db_ops --rows 100k 1M --baseline db_ops.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import logging
+import argparse
+import tempfile
+
+import benchmarks  # noqa: F401  (puts inventory_app on sys.path)
+from benchmarks.common import latency_summary, write_report, setup_benchmark_logging
+
+from config import BATCH_COMMIT_SIZE
+from db import Database
+
+
+DEFAULT_ROWS = ("100k", "1M", "5M")
+POPULATE_BATCH_SIZE = 5000
+FILES_PER_DIR = 12
+ALBUMS_PER_ARTIST = 10
+METADATA_SHARE = 0.8
+
+
+# --------------------------------------------------
+# Synthetic Rows
+# --------------------------------------------------
+
+def parse_count(text: str) -> int:
+    """
+    "100k" -> 100000, "5M" -> 5000000.
+    """
+
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(text[-1].lower(), 1)
+    return int(float(text[:-1] if multiplier > 1 else text) * multiplier)
+
+
+def relative_path(index: int) -> str:
+    directory = index // FILES_PER_DIR
+    return (f"Artist {directory // ALBUMS_PER_ARTIST:06d}/"
+            f"Album {directory % ALBUMS_PER_ARTIST:02d}/{index:09d} Track.flac")
+
+
+def file_row(drive_id: int, path: str, rng, with_metadata=True) -> dict:
+    return {
+        "drive_id": drive_id,
+        "relative_path": path,
+        "file_name": path.rpartition("/")[2],
+        "extension": ".flac",
+        "size_bytes": rng.randrange(5_000_000, 60_000_000),
+        "created_fs": "2024-01-01T00:00:00",
+        "modified_fs": f"2024-01-01T00:00:{rng.randrange(60):02d}",
+        "header_valid": 1,
+        "sha256": None,
+        "partial_hash": rng.randbytes(32).hex(),
+        "hash_algo": "sha256",
+        "audio_payload_hash": None,
+        "flac_md5": rng.randbytes(16).hex(),
+        "metadata": metadata(rng) if with_metadata else None,
+    }
+
+
+def metadata(rng) -> dict:
+    return {
+        "duration": rng.uniform(60, 900),
+        "bitrate": rng.randrange(400_000, 1_400_000),
+        "sample_rate": 44100,
+        "channels": 2,
+        "artist": f"Artist {rng.randrange(5000)}",
+        "album": f"Album {rng.randrange(50000)}",
+        "title": f"Title {rng.randrange(1_000_000)}",
+        "year": str(rng.randrange(1950, 2025)),
+        "estimated": False,
+    }
+
+
+def drive_key(index: int) -> str:
+    return f"benchmark-drive-{index:03d}"
+
+
+# --------------------------------------------------
+# Population
+# --------------------------------------------------
+
+def populate(db_path: str, rows: int, drives: int, seed: int) -> float:
+    """
+    Creates a database with rows files; row i is on drive i % drives.
+    Returns the seconds taken.
+    """
+
+    rng = random.Random(seed)
+    db = Database(db_path)
+    drive_ids = [db.insert_drive(drive_key(k), None, f"Drive {k}", 0, 0) for k in range(drives)]
+
+    started = time.perf_counter()
+
+    for start in range(0, rows, POPULATE_BATCH_SIZE):
+        batch = [
+            file_row(drive_ids[index % drives], relative_path(index), rng,
+                     with_metadata=rng.random() < METADATA_SHARE)
+            for index in range(start, min(start + POPULATE_BATCH_SIZE, rows))
+        ]
+        db.write_file_batch(batch, [], scan_id=1)
+
+        if (start // POPULATE_BATCH_SIZE) % 100 == 0:
+            logging.info(f"Populated {start + len(batch)} / {rows} rows")
+
+    db.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    db.close()
+
+    return time.perf_counter() - started
+
+
+def prepare_database(workdir: str, cache_dir: str | None, rows: int, drives: int, seed: int) -> dict:
+    db_path = os.path.join(workdir, f"db_ops_{rows}.db")
+    cached = os.path.join(cache_dir, f"db_ops_{rows}_{drives}_{seed}.db") if cache_dir else None
+
+    if cached and os.path.exists(cached):
+        logging.info(f"Copying populated database {cached}")
+        shutil.copyfile(cached, db_path)
+        return {"db_path": db_path, "populate_seconds": None}
+
+    logging.info(f"Populating {rows} rows")
+    seconds = populate(db_path, rows, drives, seed)
+
+    if cached:
+        os.makedirs(cache_dir, exist_ok=True)
+        shutil.copyfile(db_path, cached)
+
+    return {"db_path": db_path, "populate_seconds": round(seconds, 1)}
+
+
+# --------------------------------------------------
+# Operations
+# --------------------------------------------------
+
+def op_get_drive_id_by_key(db, ctx, rng):
+    key = drive_key(rng.randrange(ctx["drives"]))
+    return lambda: db.get_drive_id_by_key(key)
+
+
+def op_upsert_file(db, ctx, rng):
+    row = existing_or_new_row(ctx, rng)
+
+    return lambda: db.upsert_file(
+        row["drive_id"], row["relative_path"], row["file_name"], row["extension"],
+        row["size_bytes"], row["created_fs"], row["modified_fs"], row["header_valid"],
+        row["sha256"], row["partial_hash"], scan_id=2, hash_algo=row["hash_algo"],
+        audio_payload_hash=row["audio_payload_hash"], flac_md5=row["flac_md5"]
+    )
+
+
+def op_insert_path_components(db, ctx, rng):
+    file_id, path = random_file(db, ctx, rng)
+
+    if rng.random() < 0.5:
+        path = f"Moved {rng.randrange(1_000_000):07d}/{path.rpartition('/')[2]}"
+
+    return lambda: db.insert_path_components(file_id, path)
+
+
+def op_upsert_audio_metadata(db, ctx, rng):
+    file_id, _ = random_file(db, ctx, rng)
+    values = metadata(rng)
+    return lambda: db.upsert_audio_metadata(file_id, values)
+
+
+def op_write_file_batch(db, ctx, rng):
+    batch = [existing_or_new_row(ctx, rng) for _ in range(BATCH_COMMIT_SIZE)]
+    return lambda: db.write_file_batch(batch, [], scan_id=2)
+
+
+def op_mark_all_files_missing(db, ctx, rng):
+    drive_id = rng.choice(ctx["drive_ids"])
+    return lambda: db.mark_all_files_missing(drive_id)
+
+
+def op_finalize_missing_files(db, ctx, rng):
+    drive_id = rng.choice(ctx["drive_ids"])
+    return lambda: db.finalize_missing_files(drive_id, 2)
+
+
+def existing_or_new_row(ctx, rng) -> dict:
+    """
+    Row for an existing path or, half of the time, a new one.
+    """
+
+    if rng.random() < 0.5:
+        index = rng.randrange(ctx["rows"])
+    else:
+        index = ctx["next_index"]
+        ctx["next_index"] += 1
+
+    return file_row(ctx["drive_ids"][index % ctx["drives"]], relative_path(index), rng)
+
+
+def random_file(db, ctx, rng) -> tuple:
+    while True:
+        row = db.conn.execute(
+            "SELECT file_id, relative_path FROM files WHERE file_id = ?",
+            (rng.randrange(1, ctx["rows"] + 1),)
+        ).fetchone()
+        if row is not None:
+            return row
+
+
+# name -> (builder returning the call to time, iterations argument)
+OPERATIONS = {
+    "get_drive_id_by_key": (op_get_drive_id_by_key, "ops"),
+    "upsert_file": (op_upsert_file, "ops"),
+    "insert_path_components": (op_insert_path_components, "ops"),
+    "upsert_audio_metadata": (op_upsert_audio_metadata, "ops"),
+    "write_file_batch": (op_write_file_batch, "batch_ops"),
+    "mark_all_files_missing": (op_mark_all_files_missing, "bulk_ops"),
+    "finalize_missing_files": (op_finalize_missing_files, "bulk_ops"),
+}
+
+
+def run_operation(db, name, iterations, ctx, rng) -> dict:
+    builder = OPERATIONS[name][0]
+    size_before = database_size(db)
+    latencies_ms = []
+    total = 0.0
+
+    for _ in range(iterations):
+        call = builder(db, ctx, rng)
+
+        started = time.perf_counter()
+        call()
+        elapsed = time.perf_counter() - started
+
+        latencies_ms.append(elapsed * 1000)
+        total += elapsed
+
+    growth = database_size(db) - size_before
+
+    return dict(
+        latency_summary(latencies_ms),
+        ops_per_s=round(iterations / total, 1) if total else None,
+        db_growth_bytes=growth,
+        db_growth_per_op=round(growth / iterations, 1) if iterations else None,
+    )
+
+
+def database_size(db) -> int:
+    db.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return os.path.getsize(db.db_path)
+
+
+# --------------------------------------------------
+# Regression Check
+# --------------------------------------------------
+
+def find_regressions(report: dict, baseline: dict, threshold: float,
+                     min_p99_delta_ms: float) -> list:
+    """
+    Compares ops/s and p99 per (rows, operation) present in both reports.
+    """
+
+    regressions = []
+
+    for rows, result in report["sizes"].items():
+        base_ops = baseline.get("sizes", {}).get(rows, {}).get("operations", {})
+
+        for name, current in result["operations"].items():
+            base = base_ops.get(name)
+            if not base:
+                continue
+
+            if base.get("ops_per_s") and current["ops_per_s"] < base["ops_per_s"] * (1 - threshold):
+                regressions.append(f"{name} @ {rows} rows: {current['ops_per_s']} ops/s "
+                                   f"(baseline {base['ops_per_s']})")
+
+            if base.get("p99_ms") and current["p99_ms"] > base["p99_ms"] * (1 + threshold) and \
+                    current["p99_ms"] - base["p99_ms"] > min_p99_delta_ms:
+                regressions.append(f"{name} @ {rows} rows: p99 {current['p99_ms']} ms "
+                                   f"(baseline {base['p99_ms']})")
+
+    return regressions
+
+
+# --------------------------------------------------
+# Main
+# --------------------------------------------------
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", nargs="+", default=list(DEFAULT_ROWS),
+                        help="database sizes in files, e.g. 100k 1M 5M (default)")
+    parser.add_argument("--drives", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=2000,
+                        help="calls per single-row operation (default: 2000)")
+    parser.add_argument("--batch-ops", type=int, default=200,
+                        help="write_file_batch calls (default: 200)")
+    parser.add_argument("--bulk-ops", type=int, default=3,
+                        help="calls per whole-drive operation (default: 3)")
+    parser.add_argument("--operations", nargs="+", choices=OPERATIONS, default=list(OPERATIONS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", default=None,
+                        help="directory for the databases (default: system temp dir)")
+    parser.add_argument("--cache-dir", default=None,
+                        help="keep populated databases here and reuse them")
+    parser.add_argument("--baseline", help="earlier --json report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed ops/s drop or p99 rise vs the baseline (default: 0.25)")
+    parser.add_argument("--min-p99-delta-ms", type=float, default=0.1,
+                        help="smallest p99 rise counted as a regression (default: 0.1)")
+    parser.add_argument("--json", dest="json_path", help="also write the report here")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    setup_benchmark_logging()
+
+    report = {
+        "benchmark": "db_ops",
+        "drives": args.drives,
+        "iterations": {"ops": args.ops, "batch_ops": args.batch_ops, "bulk_ops": args.bulk_ops},
+        "sizes": {},
+    }
+
+    with tempfile.TemporaryDirectory(dir=args.workdir, prefix="db-ops-bench-") as workdir:
+
+        for rows in map(parse_count, args.rows):
+            prepared = prepare_database(workdir, args.cache_dir, rows, args.drives, args.seed)
+
+            db = Database(prepared["db_path"])
+            ctx = {
+                "rows": rows,
+                "drives": args.drives,
+                "drive_ids": [db.get_drive_id_by_key(drive_key(k)) for k in range(args.drives)],
+                "next_index": rows,
+            }
+            rng = random.Random(args.seed + 1)
+
+            # Load the per-drive directory caches up front; a scan pays
+            # this once, it would otherwise land in the first timed calls
+            for drive_id in ctx["drive_ids"]:
+                db.get_directory_id(drive_id, "")
+
+            result = {
+                "populate_seconds": prepared["populate_seconds"],
+                "db_bytes": database_size(db),
+                "operations": {},
+            }
+
+            for name in args.operations:
+                iterations = getattr(args, OPERATIONS[name][1])
+                logging.info(f"{rows} rows: {name} x {iterations}")
+                result["operations"][name] = run_operation(db, name, iterations, ctx, rng)
+
+            result["db_bytes_after"] = database_size(db)
+            db.close()
+            os.remove(prepared["db_path"])
+
+            report["sizes"][str(rows)] = result
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+        report["regressions"] = find_regressions(report, baseline, args.threshold,
+                                                 args.min_p99_delta_ms)
+
+    write_report(report, args.json_path)
+
+    for regression in report.get("regressions", []):
+        logging.error(f"REGRESSION {regression}")
+
+    if report.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
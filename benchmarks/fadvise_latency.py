@@ -0,0 +1,188 @@
+"""
+DB write latency while hashing a large file, with and without
+posix_fadvise page cache hints.
+
+A writer thread commits a small write_file_batch every --interval-ms
+to a temporary database and records each commit's latency, through
+three phases:
+
+    idle        no hashing (baseline)
+    no-fadvise  hashing the file with ChunkReader(fadvise=False)
+    fadvise     hashing the file with ChunkReader(fadvise=True)
+
+The file is dropped from the page cache before each hashing phase (best
+effort), and the growth of "Cached" in /proc/meminfo is reported per
+phase. With hints on, latency should stay at the idle level and the
+page cache should not grow by the file size.
+
+    python -m benchmarks.fadvise_latency --size-mb 4096 --workdir /mnt/archive
+"""
+
+import os
+import time
+import logging
+import argparse
+import tempfile
+import threading
+
+import benchmarks  # noqa: F401  (puts inventory_app on sys.path)
+from benchmarks.common import (
+    latency_summary, write_report, setup_benchmark_logging,
+    page_cache_bytes, drop_from_cache
+)
+
+from db import Database
+from chunk_reader import ChunkReader
+from hasher import compute_sha256
+
+
+# --------------------------------------------------
+# Helpers
+# --------------------------------------------------
+
+def create_test_file(path: str, size_mb: int):
+    block = os.urandom(1024 * 1024)
+
+    with open(path, "wb") as f:
+        for _ in range(size_mb):
+            f.write(block)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+# --------------------------------------------------
+# DB Writer Load
+# --------------------------------------------------
+
+class LatencyProbe(threading.Thread):
+    """
+    Commits batch_rows file rows every interval and records the
+    latency of each commit under the current phase.
+    """
+
+    def __init__(self, db, drive_id, interval, batch_rows):
+        super().__init__(name="latency-probe", daemon=True)
+        self.db = db
+        self.drive_id = drive_id
+        self.interval = interval
+        self.batch_rows = batch_rows
+
+        self.phase = "idle"
+        self.latencies = {}
+        self.stop_event = threading.Event()
+        self.counter = 0
+
+    def run(self):
+        while not self.stop_event.is_set():
+            batch = [self._row() for _ in range(self.batch_rows)]
+
+            started = time.perf_counter()
+            self.db.write_file_batch(batch, [], scan_id=1)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+
+            self.latencies.setdefault(self.phase, []).append(elapsed_ms)
+            self.stop_event.wait(self.interval)
+
+    def _row(self):
+        self.counter += 1
+        name = f"track{self.counter:08d}.flac"
+
+        return {
+            "drive_id": self.drive_id,
+            "relative_path": f"probe/{self.counter // 1000:05d}/{name}",
+            "file_name": name,
+            "extension": ".flac",
+            "size_bytes": 30_000_000,
+            "created_fs": "2024-01-01T00:00:00",
+            "modified_fs": "2024-01-01T00:00:00",
+            "header_valid": 1,
+            "sha256": None,
+            "partial_hash": os.urandom(32).hex(),
+            "hash_algo": "sha256",
+            "audio_payload_hash": None,
+            "flac_md5": None,
+            "metadata": None,
+        }
+
+
+# --------------------------------------------------
+# Main
+# --------------------------------------------------
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--file", help="existing large file to hash (default: create one)")
+    parser.add_argument("--size-mb", type=int, default=1024,
+                        help="size of the generated file (default: 1024)")
+    parser.add_argument("--workdir", default=None,
+                        help="directory for the generated file and database "
+                             "(default: system temp dir)")
+    parser.add_argument("--idle-seconds", type=float, default=5.0)
+    parser.add_argument("--interval-ms", type=float, default=20.0)
+    parser.add_argument("--batch-rows", type=int, default=100)
+    parser.add_argument("--json", dest="json_path", help="also write the report here")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    setup_benchmark_logging()
+
+    with tempfile.TemporaryDirectory(dir=args.workdir, prefix="fadvise-bench-") as workdir:
+
+        path = args.file
+        if path is None:
+            path = os.path.join(workdir, "large.bin")
+            logging.info(f"Creating {args.size_mb} MB test file {path}")
+            create_test_file(path, args.size_mb)
+
+        db = Database(os.path.join(workdir, "bench.db"))
+        drive_id = db.insert_drive("benchmark-drive", None, "benchmark", 0, 0)
+
+        probe = LatencyProbe(db, drive_id, args.interval_ms / 1000, args.batch_rows)
+        probe.start()
+
+        phases = {"idle": {"seconds": args.idle_seconds}}
+        time.sleep(args.idle_seconds)
+
+        for phase, fadvise in (("no-fadvise", False), ("fadvise", True)):
+            drop_from_cache(path)
+            cached_before = page_cache_bytes()
+
+            reader = ChunkReader(fadvise=fadvise)
+            probe.phase = phase
+
+            started = time.perf_counter()
+            compute_sha256(path, reader=reader)
+            seconds = time.perf_counter() - started
+
+            probe.phase = f"{phase}-done"
+            cached_after = page_cache_bytes()
+
+            phases[phase] = {
+                "seconds": round(seconds, 3),
+                "hash_mb_s": round(os.path.getsize(path) / seconds / 1e6, 1),
+                "page_cache_growth_mb": (
+                    round((cached_after - cached_before) / 1e6, 1)
+                    if cached_before is not None else None
+                ),
+            }
+
+        probe.stop_event.set()
+        probe.join()
+        db.close()
+
+        for phase in phases:
+            phases[phase]["db_write_latency"] = latency_summary(probe.latencies.get(phase, []))
+
+        write_report({
+            "benchmark": "fadvise_latency",
+            "file_bytes": os.path.getsize(path),
+            "interval_ms": args.interval_ms,
+            "batch_rows": args.batch_rows,
+            "phases": phases,
+        }, args.json_path)
+
+
+if __name__ == "__main__":
+    main()
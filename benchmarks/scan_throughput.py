@@ -0,0 +1,181 @@
+"""
+End-to-end scan throughput on a synthetic drive (see synthetic_drive).
+
+Generates a reproducible tree, then runs Scanner against a temporary
+database twice:
+
+    first_scan  every file is new: header check, hashing, tag parsing
+    rescan      the same tree again (--rescan-mode, default skip)
+
+Each phase reports files/s, MB/s (bytes read from the drive and bytes
+of the files scanned), the time every pipeline stage spent working and
+waiting, and the database size. The drive is dropped from the page
+cache before each phase unless --warm is given, so the first scan reads
+from disk. The JSON report can be kept (--json) for regression
+tracking.
+
+    python -m benchmarks.scan_throughput --files 5000 --size-profile small --json scan.json
+"""
+
+import os
+import time
+import logging
+import argparse
+import tempfile
+
+import benchmarks  # noqa: F401  (puts inventory_app on sys.path)
+from benchmarks.common import write_report, setup_benchmark_logging, drop_from_cache
+from benchmarks.synthetic_drive import generate_drive, add_generator_arguments, generator_options
+
+from config import (
+    RESCAN_MODES, METADATA_MODES, DEFAULT_METADATA_MODE, HASH_ALGORITHMS, DEFAULT_HASH_ALGO
+)
+from db import Database
+from scanner import Scanner
+
+
+# --------------------------------------------------
+# Phases
+# --------------------------------------------------
+
+def run_scan(db, drive_id, root, options) -> dict:
+    """
+    Runs one Scanner over root and returns its measurements.
+    """
+
+    scanner = Scanner(db=db, drive_id=drive_id, drive_root=root, **options)
+
+    started = time.perf_counter()
+    scanner.run()
+    seconds = time.perf_counter() - started
+
+    return {
+        "seconds": round(seconds, 3),
+        "files": scanner.total_files,
+        "new_files": scanner.new_files,
+        "reprocessed_files": scanner.reprocessed_files,
+        "skipped_files": scanner.skipped_files,
+        "pruned_dirs": scanner.pruned_dirs,
+        "audio_files": scanner.audio_files,
+        "files_per_s": round(scanner.total_files / seconds, 1),
+        "read_mb": round(scanner.bytes_read() / 1e6, 1),
+        "read_mb_s": round(scanner.bytes_read() / seconds / 1e6, 1),
+        "scanned_mb_s": round(scanner.total_bytes / seconds / 1e6, 1),
+        "metadata_cache_hits": scanner.metadata_cache_hits,
+        "db_commits": scanner.writer.flush_count,
+        "stages": stage_times(scanner.pipeline),
+    }
+
+
+def stage_times(pipeline) -> dict:
+    """
+    Per stage: items, wall time, time waiting for input / output, and
+    the remainder spent working.
+    """
+
+    stages = {}
+
+    for stage in pipeline.stages:
+        elapsed = stage.elapsed()
+        stages[stage.stage_name] = {
+            "items": stage.items,
+            "elapsed_s": round(elapsed, 3),
+            "busy_s": round(max(elapsed - stage.wait_in - stage.wait_out, 0.0), 3),
+            "wait_in_s": round(stage.wait_in, 3),
+            "wait_out_s": round(stage.wait_out, 3),
+        }
+
+    return stages
+
+
+def drop_tree_from_cache(root: str):
+    for directory, _, names in os.walk(root):
+        for name in names:
+            drop_from_cache(os.path.join(directory, name))
+
+
+def database_size(db_path: str) -> int:
+    return sum(
+        os.path.getsize(db_path + suffix)
+        for suffix in ("", "-wal")
+        if os.path.exists(db_path + suffix)
+    )
+
+
+# --------------------------------------------------
+# Main
+# --------------------------------------------------
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    add_generator_arguments(parser)
+    parser.add_argument("--workdir", default=None,
+                        help="directory for the tree and database (default: system temp dir); "
+                             "put it on the device to measure")
+    parser.add_argument("--rescan-mode", choices=RESCAN_MODES, default="skip")
+    parser.add_argument("--compute-full-hash", action="store_true")
+    parser.add_argument("--hash-algo", choices=HASH_ALGORITHMS, default=DEFAULT_HASH_ALGO)
+    parser.add_argument("--hash-workers", type=int, default=None)
+    parser.add_argument("--metadata-processes", type=int, default=0)
+    parser.add_argument("--metadata-mode", choices=METADATA_MODES, default=DEFAULT_METADATA_MODE)
+    parser.add_argument("--warm", action="store_true",
+                        help="keep the tree in the page cache between phases")
+    parser.add_argument("--quiet", action="store_true", help="log warnings only")
+    parser.add_argument("--json", dest="json_path", help="also write the report here")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    setup_benchmark_logging()
+
+    if args.quiet:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    scan_options = {
+        "compute_full_hash": args.compute_full_hash,
+        "hash_algo": args.hash_algo,
+        "hash_workers": args.hash_workers,
+        "metadata_processes": args.metadata_processes,
+        "metadata_mode": args.metadata_mode,
+    }
+
+    with tempfile.TemporaryDirectory(dir=args.workdir, prefix="scan-bench-") as workdir:
+
+        root = os.path.join(workdir, "drive")
+        db_path = os.path.join(workdir, "bench.db")
+
+        logging.warning(f"Generating {args.files} files under {root}")
+        started = time.perf_counter()
+        tree = generate_drive(root, **generator_options(args))
+        tree["seconds"] = round(time.perf_counter() - started, 3)
+
+        db = Database(db_path)
+        drive_id = db.insert_drive("benchmark-drive", None, "benchmark", 0, 0)
+
+        phases = {}
+
+        for phase, rescan_mode in (("first_scan", "skip"), ("rescan", args.rescan_mode)):
+            if not args.warm:
+                drop_tree_from_cache(root)
+
+            logging.warning(f"Running {phase} ({rescan_mode})")
+            phases[phase] = run_scan(db, drive_id, root, dict(scan_options, rescan_mode=rescan_mode))
+            phases[phase]["db_bytes"] = database_size(db_path)
+
+        db.close()
+
+    first, rescan = phases["first_scan"], phases["rescan"]
+
+    write_report({
+        "benchmark": "scan_throughput",
+        "generator": generator_options(args),
+        "tree": tree,
+        "scan_options": dict(scan_options, rescan_mode=args.rescan_mode, warm=args.warm),
+        "phases": phases,
+        "rescan_speedup": round(first["seconds"] / rescan["seconds"], 2) if rescan["seconds"] else None,
+    }, args.json_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""
+Reproducible synthetic drive trees for the scan benchmarks.
+
+Files are spread over directories nested --depth levels deep and come in
+three audio formats with valid headers and tags, plus junk files that
+only carry an audio extension:
+
+    mp3   ID3v2.3 tag (title, artist, album, year), 128 kbit/s MPEG-1
+          layer III frames, ID3v1 tag
+    flac  STREAMINFO (with an MD5) and VORBIS_COMMENT blocks, then frame
+          data
+    wav   fmt (PCM 44.1 kHz, 16 bit, stereo), LIST/INFO tags, data chunk
+    junk  random bytes named .mp3 / .flac / .wav
+
+Sizes are drawn from a log-normal distribution per format (see
+SIZE_PROFILES). Audio data is random, so every file is distinct, but the
+same seed always produces the same tree, byte for byte.
+
+    python -m benchmarks.synthetic_drive /tmp/drive --files 5000 --depth 3
+"""
+
+import os
+import math
+import random
+import struct
+import logging
+import argparse
+
+import benchmarks  # noqa: F401  (puts inventory_app on sys.path)
+from benchmarks.common import write_report, setup_benchmark_logging
+
+
+# Median file size in bytes per format; sizes vary log-normally around it
+SIZE_PROFILES = {
+    "tiny": {"mp3": 96 * 1024, "flac": 256 * 1024, "wav": 384 * 1024, "junk": 16 * 1024},
+    "small": {"mp3": 1024 * 1024, "flac": 3 * 1024 * 1024, "wav": 4 * 1024 * 1024, "junk": 64 * 1024},
+    "music": {"mp3": 6 * 1024 * 1024, "flac": 30 * 1024 * 1024, "wav": 45 * 1024 * 1024, "junk": 256 * 1024},
+}
+
+# Share of the audio files per format
+FORMAT_WEIGHTS = {"mp3": 0.5, "flac": 0.4, "wav": 0.1}
+
+SIZE_SIGMA = 0.5
+MIN_FILE_SIZE = 8 * 1024
+
+# Audio data is a per-file random block repeated up to the file size
+FILL_BLOCK_SIZE = 64 * 1024
+
+# 128 kbit/s, 44.1 kHz, MPEG-1 layer III, no CRC, joint stereo
+MP3_FRAME_HEADER = b"\xff\xfb\x90\x64"
+MP3_FRAME_SIZE = 417
+
+SAMPLE_RATE = 44100
+
+
+# --------------------------------------------------
+# Tree Layout
+# --------------------------------------------------
+
+def leaf_directories(files: int, depth: int, files_per_dir: int) -> list:
+    """
+    Relative paths of the leaf directories, depth levels deep, holding
+    about files_per_dir files each.
+    """
+
+    leaves = max(1, math.ceil(files / files_per_dir))
+
+    if depth <= 0:
+        return [""]
+
+    fanout = max(1, math.ceil(leaves ** (1 / depth)))
+    paths = []
+
+    for index in range(leaves):
+        digits = []
+        for _ in range(depth):
+            digits.append(index % fanout)
+            index //= fanout
+
+        paths.append("/".join(
+            f"{_LEVEL_NAMES[min(level, len(_LEVEL_NAMES) - 1)]} {digit:03d}"
+            for level, digit in enumerate(reversed(digits))
+        ))
+
+    return paths
+
+
+_LEVEL_NAMES = ("Artist", "Album", "Disc", "Set")
+
+
+# --------------------------------------------------
+# Generation
+# --------------------------------------------------
+
+def generate_drive(root: str, files=1000, depth=2, files_per_dir=12,
+                   size_profile="small", junk_fraction=0.05, seed=0) -> dict:
+    """
+    Writes the tree under root and returns a summary: file and byte
+    counts, overall and per format.
+    """
+
+    rng = random.Random(seed)
+    medians = SIZE_PROFILES[size_profile]
+    directories = leaf_directories(files, depth, files_per_dir)
+    summary = {"files": 0, "bytes": 0, "directories": len(directories), "formats": {}}
+
+    for index in range(files):
+        relative_dir = directories[index % len(directories)]
+        kind = "junk" if rng.random() < junk_fraction else _pick_format(rng)
+        extension = rng.choice(("mp3", "flac", "wav")) if kind == "junk" else kind
+
+        size = max(MIN_FILE_SIZE, int(rng.lognormvariate(math.log(medians[kind]), SIZE_SIGMA)))
+        tags = {
+            "title": f"Track {index:06d}",
+            "artist": f"Artist {index % 97:02d}",
+            "album": f"Album {index % 389:03d}",
+            "year": str(1960 + index % 60),
+        }
+
+        directory = os.path.join(root, *relative_dir.split("/")) if relative_dir else root
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{index % files_per_dir + 1:02d} {tags['title']}.{extension}")
+
+        written = _WRITERS[kind](path, size, tags, rng)
+
+        summary["files"] += 1
+        summary["bytes"] += written
+        counts = summary["formats"].setdefault(kind, {"files": 0, "bytes": 0})
+        counts["files"] += 1
+        counts["bytes"] += written
+
+    return summary
+
+
+def _pick_format(rng) -> str:
+    return rng.choices(list(FORMAT_WEIGHTS), weights=list(FORMAT_WEIGHTS.values()))[0]
+
+
+def _fill(f, length: int, rng):
+    block = rng.randbytes(FILL_BLOCK_SIZE)
+
+    while length > 0:
+        count = min(length, len(block))
+        f.write(block[:count])
+        length -= count
+
+
+# --------------------------------------------------
+# Formats
+# --------------------------------------------------
+
+def _write_mp3(path, size, tags, rng) -> int:
+    frames = b"".join(
+        _id3v2_text_frame(frame_id, tags[key])
+        for frame_id, key in (("TIT2", "title"), ("TPE1", "artist"), ("TALB", "album"), ("TYER", "year"))
+    )
+    id3v2 = b"ID3\x03\x00\x00" + _syncsafe(len(frames)) + frames
+    id3v1 = b"TAG" + b"".join(
+        tags[key].encode("latin-1")[:30].ljust(30, b"\x00")
+        for key in ("title", "artist", "album")
+    ) + tags["year"].encode("latin-1")[:4].ljust(4, b"\x00") + b"\x00" * 30 + b"\xff"
+
+    frame_count = max(1, (size - len(id3v2) - len(id3v1)) // MP3_FRAME_SIZE)
+    payload = rng.randbytes(MP3_FRAME_SIZE - 4)
+
+    with open(path, "wb") as f:
+        f.write(id3v2)
+        frame = MP3_FRAME_HEADER + payload
+        for _ in range(frame_count):
+            f.write(frame)
+        f.write(id3v1)
+
+    return len(id3v2) + frame_count * MP3_FRAME_SIZE + len(id3v1)
+
+
+def _write_flac(path, size, tags, rng) -> int:
+    comments = [f"{key.upper() if key != 'year' else 'DATE'}={value}".encode("utf-8")
+                for key, value in tags.items()]
+    vendor = b"synthetic"
+    vorbis_comment = struct.pack("<I", len(vendor)) + vendor + struct.pack("<I", len(comments)) + \
+        b"".join(struct.pack("<I", len(comment)) + comment for comment in comments)
+
+    header_size = 4 + (4 + 34) + (4 + len(vorbis_comment))
+    audio_size = max(0, size - header_size)
+
+    # ~4.3 bytes per sample frame, as a 16-bit stereo FLAC would have
+    total_samples = max(1, audio_size * 10 // 43)
+    packed = SAMPLE_RATE << 44 | (2 - 1) << 41 | (16 - 1) << 36 | total_samples
+    stream_info = struct.pack(">HH", 4096, 4096) + b"\x00" * 6 + \
+        packed.to_bytes(8, "big") + rng.randbytes(16)
+
+    with open(path, "wb") as f:
+        f.write(b"fLaC")
+        f.write(b"\x00" + len(stream_info).to_bytes(3, "big") + stream_info)
+        f.write(b"\x84" + len(vorbis_comment).to_bytes(3, "big") + vorbis_comment)
+        _fill(f, audio_size, rng)
+
+    return header_size + audio_size
+
+
+def _write_wav(path, size, tags, rng) -> int:
+    info = b"".join(
+        _riff_chunk(chunk_id, tags[key].encode("latin-1") + b"\x00")
+        for chunk_id, key in ((b"INAM", "title"), (b"IART", "artist"), (b"IPRD", "album"), (b"ICRD", "year"))
+    )
+    fmt = _riff_chunk(b"fmt ", struct.pack("<HHIIHH", 1, 2, SAMPLE_RATE, SAMPLE_RATE * 4, 4, 16))
+    list_chunk = _riff_chunk(b"LIST", b"INFO" + info)
+
+    header_size = 12 + len(fmt) + len(list_chunk) + 8
+    data_size = max(4, (size - header_size) // 4 * 4)
+
+    with open(path, "wb") as f:
+        f.write(b"RIFF" + struct.pack("<I", header_size - 8 + data_size) + b"WAVE")
+        f.write(fmt)
+        f.write(list_chunk)
+        f.write(b"data" + struct.pack("<I", data_size))
+        _fill(f, data_size, rng)
+
+    return header_size + data_size
+
+
+def _write_junk(path, size, tags, rng) -> int:
+    with open(path, "wb") as f:
+        # Starts with a zero byte so no audio signature can match
+        f.write(b"\x00")
+        _fill(f, size - 1, rng)
+
+    return size
+
+
+_WRITERS = {"mp3": _write_mp3, "flac": _write_flac, "wav": _write_wav, "junk": _write_junk}
+
+
+def _id3v2_text_frame(frame_id: str, text: str) -> bytes:
+    body = b"\x03" + text.encode("utf-8")
+    return frame_id.encode("ascii") + struct.pack(">I", len(body)) + b"\x00\x00" + body
+
+
+def _syncsafe(value: int) -> bytes:
+    return bytes(((value >> shift) & 0x7F) for shift in (21, 14, 7, 0))
+
+
+def _riff_chunk(chunk_id: bytes, data: bytes) -> bytes:
+    padding = b"\x00" if len(data) & 1 else b""
+    return chunk_id + struct.pack("<I", len(data)) + data + padding
+
+
+# --------------------------------------------------
+# Main
+# --------------------------------------------------
+
+def add_generator_arguments(parser):
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument("--depth", type=int, default=2, help="directory levels (default: 2)")
+    parser.add_argument("--files-per-dir", type=int, default=12)
+    parser.add_argument("--size-profile", choices=SIZE_PROFILES, default="small",
+                        help="median file sizes per format (default: small)")
+    parser.add_argument("--junk-fraction", type=float, default=0.05,
+                        help="share of junk files with audio extensions (default: 0.05)")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def generator_options(args) -> dict:
+    return {
+        "files": args.files,
+        "depth": args.depth,
+        "files_per_dir": args.files_per_dir,
+        "size_profile": args.size_profile,
+        "junk_fraction": args.junk_fraction,
+        "seed": args.seed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("root", help="directory to create the tree in")
+    add_generator_arguments(parser)
+    args = parser.parse_args()
+
+    setup_benchmark_logging()
+    logging.info(f"Generating {args.files} files under {args.root}")
+
+    write_report(generate_drive(args.root, **generator_options(args)), None)
+
+
+if __name__ == "__main__":
+    main()
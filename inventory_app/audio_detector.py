@@ -11,6 +11,7 @@ MAGIC_HEADERS = {
     ".mp3": [b"ID3", b"\xff\xfb"],
     ".flac": [b"fLaC"],
     ".wav": [b"RIFF"],
+    ".aiff": [b"FORM"],
     ".aac": [b"\xff\xf1", b"\xff\xf9"],
     ".ogg": [b"OggS"],
     ".m4a": [b"\x00\x00\x00"],
@@ -31,26 +32,35 @@ def is_extension_allowed(file_name: str) -> bool:
 # --------------------------------------------------
 
 def validate_audio_header(file_path: str) -> bool:
-    ext = os.path.splitext(file_path)[1].lower()
-
-    if ext not in MAGIC_HEADERS:
-        return False
-
     try:
         with open(file_path, "rb") as f:
             header = f.read(16)
 
-        for magic in MAGIC_HEADERS[ext]:
-            if header.startswith(magic):
-                return True
-
-        return False
+        return validate_header_bytes(file_path, header)
 
     except Exception as e:
         logging.error(f"Header validation failed for {file_path}: {e}")
         return False
 
 
+def validate_header_bytes(file_path: str, header: bytes) -> bool:
+    """
+    Checks already-read leading bytes against the magic headers for the
+    file's extension.
+    """
+
+    ext = os.path.splitext(file_path)[1].lower()
+
+    if ext not in MAGIC_HEADERS:
+        return False
+
+    for magic in MAGIC_HEADERS[ext]:
+        if header.startswith(magic):
+            return True
+
+    return False
+
+
 # --------------------------------------------------
 # Main Check
 # --------------------------------------------------
@@ -64,3 +74,19 @@ def is_valid_audio(file_path: str) -> bool:
         return False
 
     return True
+
+
+def is_valid_audio_header(file_path: str, header: bytes) -> bool:
+    """
+    Same as is_valid_audio, but validates leading bytes the caller has
+    already read instead of reopening the file.
+    """
+
+    if not is_extension_allowed(file_path):
+        return False
+
+    if not validate_header_bytes(file_path, header):
+        logging.warning(f"Header invalid: {file_path}")
+        return False
+
+    return True
@@ -0,0 +1,380 @@
+import struct
+
+from config import TAG_TAIL_SIZE
+from hasher import new_hash
+
+
+# Layout marker for Ogg streams, whose audio is filtered page by page
+OGG = "ogg"
+
+
+# --------------------------------------------------
+# Payload Location
+# --------------------------------------------------
+
+def locate_payload(read_at, size: int):
+    """
+    Finds the audio stream of a file from its container structure.
+
+    read_at(offset, length) -> bytes reads from the file. Returns:
+    - a list of (start, end) byte ranges; end None means "up to the
+      trailing tags" (ID3v1 / APEv2 / Lyrics3), resolved from the tail
+      once the file has been read
+    - OGG for Ogg streams (see PayloadHasher)
+    - None when the format is not recognized
+
+    Formats:
+    - MP3 / AAC (ADTS) : after any ID3v2 tags, up to the trailing tags
+    - FLAC             : after the metadata blocks, up to trailing tags
+    - WAV              : the "data" chunk
+    - AIFF / AIFC      : the sample data of the "SSND" chunk
+    - M4A / MP4        : the "mdat" atoms
+    """
+
+    head = read_at(0, 12)
+
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return _riff_data(read_at, size)
+
+    if head[:4] == b"FORM" and head[8:12] in (b"AIFF", b"AIFC"):
+        return _aiff_sound_data(read_at, size)
+
+    if head[:4] == b"OggS":
+        return OGG
+
+    if head[4:8] == b"ftyp":
+        return _mp4_media_data(read_at, size)
+
+    start = _skip_id3v2(read_at, size)
+    magic = read_at(start, 4)
+
+    if magic == b"fLaC":
+        audio_start = _flac_audio_start(read_at, start + 4, size)
+        return [(audio_start, None)] if audio_start is not None else None
+
+    if start or (len(magic) >= 2 and magic[0] == 0xFF and magic[1] & 0xE0 == 0xE0):
+        # MPEG audio / ADTS frame sync (or anything behind an ID3v2 tag)
+        return [(start, None)]
+
+    return None
+
+
+def leading_tags_end(read_at, size: int) -> int:
+    """
+    Offset where the data after any leading ID3v2 tags begins.
+    """
+
+    return _skip_id3v2(read_at, size)
+
+
+def tag_region_end(read_at, size: int) -> int:
+    """
+    Offset where the leading tag region ends: after any ID3v2 tags and,
+    for FLAC, after the metadata blocks (VORBIS_COMMENT, PICTURE, ...).
+    """
+
+    start = _skip_id3v2(read_at, size)
+
+    if read_at(start, 4) == b"fLaC":
+        audio_start = _flac_audio_start(read_at, start + 4, size)
+        return audio_start if audio_start is not None else start
+
+    return start
+
+
+def _skip_id3v2(read_at, size: int) -> int:
+    offset = 0
+
+    while offset < size:
+        header = read_at(offset, 10)
+
+        if len(header) < 10 or header[:3] != b"ID3":
+            break
+
+        tag_size = (
+            (header[6] & 0x7F) << 21 | (header[7] & 0x7F) << 14 |
+            (header[8] & 0x7F) << 7 | (header[9] & 0x7F)
+        )
+        has_footer = header[5] & 0x10
+        offset += 10 + tag_size + (10 if has_footer else 0)
+
+    return min(offset, size)
+
+
+def _flac_audio_start(read_at, offset: int, size: int) -> int | None:
+    while offset + 4 <= size:
+        header = read_at(offset, 4)
+
+        if len(header) < 4:
+            return None
+
+        offset += 4 + int.from_bytes(header[1:4], "big")
+
+        if header[0] & 0x80:  # last metadata block
+            return offset
+
+    return None
+
+
+def _riff_data(read_at, size: int):
+    offset = 12
+
+    while offset + 8 <= size:
+        header = read_at(offset, 8)
+
+        if len(header) < 8:
+            return None
+
+        chunk_id, length = struct.unpack("<4sI", header)
+
+        if chunk_id == b"data":
+            return [(offset + 8, min(offset + 8 + length, size))]
+
+        offset += 8 + length + (length & 1)
+
+    return None
+
+
+def _aiff_sound_data(read_at, size: int):
+    offset = 12
+
+    while offset + 8 <= size:
+        header = read_at(offset, 16)
+
+        if len(header) < 8:
+            return None
+
+        chunk_id, length = struct.unpack(">4sI", header[:8])
+
+        if chunk_id == b"SSND" and len(header) == 16:
+            data_offset = struct.unpack(">I", header[8:12])[0]
+            return [(offset + 16 + data_offset, min(offset + 8 + length, size))]
+
+        offset += 8 + length + (length & 1)
+
+    return None
+
+
+def _mp4_media_data(read_at, size: int):
+    ranges = []
+    offset = 0
+
+    while offset + 8 <= size:
+        header = read_at(offset, 16)
+
+        if len(header) < 8:
+            return None
+
+        length, kind = struct.unpack(">I4s", header[:8])
+        header_size = 8
+
+        if length == 1 and len(header) == 16:
+            length = struct.unpack(">Q", header[8:16])[0]
+            header_size = 16
+        elif length == 0:
+            length = size - offset
+
+        if length < header_size:
+            return None
+
+        if kind == b"mdat":
+            ranges.append((offset + header_size, min(offset + length, size)))
+
+        offset += length
+
+    return ranges or None
+
+
+def flac_streaminfo_md5(head: bytes) -> str | None:
+    """
+    MD5 of the decoded audio from the STREAMINFO block of a FLAC file
+    (hex), read from the leading bytes. None for other files, when the
+    block lies outside head, or when the encoder left it unset (zeros).
+    """
+
+    start = _skip_id3v2(lambda offset, length: head[offset:offset + length], len(head))
+
+    if head[start:start + 4] != b"fLaC":
+        return None
+
+    # STREAMINFO is always the first metadata block: 4-byte block
+    # header, then 34 bytes with the MD5 in the last 16
+    block = head[start + 4:start + 8]
+
+    if len(block) < 4 or block[0] & 0x7F != 0 or int.from_bytes(block[1:4], "big") < 34:
+        return None
+
+    md5 = head[start + 26:start + 42]
+
+    if len(md5) < 16 or not any(md5):
+        return None
+
+    return md5.hex()
+
+
+def trailing_tags_start(tail: bytes, size: int) -> int | None:
+    """
+    Offset where trailing ID3v1 / APEv2 / Lyrics3v2 tags begin (size
+    when there are none), from the last len(tail) bytes of the file.
+    None when the tags reach beyond the tail.
+    """
+
+    tail_offset = size - len(tail)
+    end = size
+    found = set()
+
+    # Each kind is stripped once, in any order (e.g. APEv2 before ID3v1)
+    while True:
+        position = end - tail_offset
+
+        if "id3v1" not in found and position >= 128 and \
+                tail[position - 128:position - 125] == b"TAG":
+            found.add("id3v1")
+            end -= 128
+            continue
+
+        if "ape" not in found and position >= 32 and \
+                tail[position - 32:position - 24] == b"APETAGEX":
+            # Footer: preamble, version, tag size (items + footer), item count, flags
+            tag_size, _, flags = struct.unpack("<III", tail[position - 20:position - 8])
+            if tag_size < 32:
+                break
+            found.add("ape")
+            end -= tag_size + (32 if flags & 0x80000000 else 0)
+            continue
+
+        if "lyrics3" not in found and position >= 15 and \
+                tail[position - 9:position] == b"LYRICS200":
+            try:
+                lyrics_size = int(tail[position - 15:position - 9])
+            except ValueError:
+                break
+            found.add("lyrics3")
+            end -= lyrics_size + 15
+            continue
+
+        break
+
+    return end if end >= tail_offset else None
+
+
+# --------------------------------------------------
+# Streaming Payload Hash
+# --------------------------------------------------
+
+class PayloadHasher:
+    """
+    Hashes the audio payload of a file while the file is read in order
+    (fed the same chunks as the file hash).
+
+    Bytes in the last TAG_TAIL_SIZE of the file are held back: they are
+    taken from the tail region at the end, once the trailing tags are
+    known. For Ogg, page headers (sequence numbers, CRCs) and the header
+    pages (granule position 0, i.e. codec setup and comments) are
+    skipped, so only audio packet data is hashed.
+    """
+
+    def __init__(self, algo: str, layout, size: int):
+        self.digest = new_hash(algo)
+        self.size = size
+        self.hold = max(0, size - TAG_TAIL_SIZE)
+        self.ogg = _OggAudioPages() if layout == OGG else None
+        self.ranges = [] if self.ogg is not None else layout
+        self.payload_bytes = 0
+
+    def update(self, position: int, chunk):
+        if self.ogg is not None:
+            self.ogg.feed(chunk, self.digest)
+            return
+
+        chunk_end = position + len(chunk)
+
+        for start, end in self.ranges:
+            stop = self.hold if end is None else end
+            low, high = max(start, position), min(stop, chunk_end)
+
+            if low < high:
+                self.digest.update(chunk[low - position:high - position])
+                self.payload_bytes += high - low
+
+    def hexdigest(self, tail: bytes | None) -> str | None:
+        """
+        Returns the payload hash, or None when it cannot be determined
+        (unparseable stream, tail missing or trailing tags too large).
+        """
+
+        if self.ogg is not None:
+            return self.digest.hexdigest() if self.ogg.complete() else None
+
+        for start, end in self.ranges:
+            if end is not None:
+                continue
+
+            if tail is None or self.size - len(tail) != self.hold:
+                return None
+
+            end = trailing_tags_start(tail, self.size)
+
+            if end is None or end < self.hold:
+                return None
+
+            low = max(start, self.hold)
+            if low < end:
+                self.digest.update(tail[low - self.hold:end - self.hold])
+                self.payload_bytes += end - low
+
+        # An empty payload (e.g. a tag with no audio) identifies nothing
+        return self.digest.hexdigest() if self.payload_bytes else None
+
+
+class _OggAudioPages:
+    """
+    Streaming Ogg page parser passing the bodies of audio pages to a
+    hash object.
+    """
+
+    def __init__(self):
+        self.header = bytearray()
+        self.body_left = 0
+        self.audio_page = False
+        self.audio_pages = 0
+        self.valid = True
+
+    def feed(self, chunk, digest):
+        view = memoryview(chunk)
+        index = 0
+
+        while index < len(view) and self.valid:
+
+            if self.body_left:
+                count = min(self.body_left, len(view) - index)
+                if self.audio_page:
+                    digest.update(view[index:index + count])
+                index += count
+                self.body_left -= count
+                continue
+
+            # Page header: 27 fixed bytes, then one lacing value per segment
+            needed = 27 if len(self.header) < 27 else 27 + self.header[26]
+            count = min(needed - len(self.header), len(view) - index)
+            self.header += view[index:index + count]
+            index += count
+
+            if len(self.header) < 27:
+                continue
+
+            if self.header[:4] != b"OggS":
+                self.valid = False
+                break
+
+            if len(self.header) < 27 + self.header[26]:
+                continue
+
+            granule_position = struct.unpack_from("<q", self.header, 6)[0]
+            self.body_left = sum(self.header[27:])
+            self.audio_page = granule_position != 0
+            self.audio_pages += self.audio_page
+            self.header.clear()
+
+    def complete(self) -> bool:
+        return self.valid and not self.header and not self.body_left and self.audio_pages > 0
@@ -0,0 +1,183 @@
+import os
+import time
+import threading
+
+from config import (
+    HASH_CHUNK_SIZE, HASH_CHUNK_MIN, HASH_CHUNK_MAX,
+    HASH_CHUNK_BY_DEVICE, HASH_CHUNK_TARGET_SECONDS, DEFAULT_FADVISE
+)
+from device_info import detect_device_kind
+
+
+# --------------------------------------------------
+# Adaptive Chunk Size
+# --------------------------------------------------
+
+class AdaptiveChunkSizer:
+    """
+    Picks the read chunk size from measured throughput.
+
+    Starts from a per-device default (large for sequential HDD reads,
+    small for network shares) and after every `window` full-size reads
+    moves to the power of two that makes one read take about
+    target_seconds at the measured rate, within [minimum, maximum].
+    Short reads (end of file) are not measured.
+    """
+
+    def __init__(self, initial=HASH_CHUNK_SIZE,
+                 minimum=HASH_CHUNK_MIN,
+                 maximum=HASH_CHUNK_MAX,
+                 target_seconds=HASH_CHUNK_TARGET_SECONDS,
+                 window=16):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_seconds = target_seconds
+        self.window = window
+        self.chunk_size = self._clamp(initial)
+
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._seconds = 0.0
+        self._reads = 0
+        self.throughput = 0.0
+
+    @classmethod
+    def for_path(cls, path: str, **kwargs):
+        return cls(initial=HASH_CHUNK_BY_DEVICE[detect_device_kind(path)], **kwargs)
+
+    def record(self, requested: int, nbytes: int, seconds: float):
+        if nbytes < requested:
+            return
+
+        with self._lock:
+            self._bytes += nbytes
+            self._seconds += seconds
+            self._reads += 1
+
+            if self._reads < self.window or self._seconds <= 0:
+                return
+
+            self.throughput = self._bytes / self._seconds
+            self.chunk_size = self._clamp(int(self.throughput * self.target_seconds))
+            self._bytes, self._seconds, self._reads = 0, 0.0, 0
+
+    def _clamp(self, size: int) -> int:
+        size = 1 << max(size - 1, 1).bit_length()  # next power of two
+        return max(self.minimum, min(self.maximum, size))
+
+
+# --------------------------------------------------
+# Buffer-Reusing Reader
+# --------------------------------------------------
+
+class ChunkReader:
+    """
+    Reads files with readinto() on one reusable buffer per thread, so
+    chunks are neither allocated per read nor copied again before
+    hashing.
+
+    read_chunk returns a memoryview into the thread's buffer; it stays
+    valid only until the same thread's next read_chunk call. Files are
+    opened and closed through the reader (unbuffered, so data goes
+    straight into the buffer).
+
+    With fadvise (Linux), files are read with POSIX_FADV_SEQUENTIAL and
+    every range already consumed is dropped with POSIX_FADV_DONTNEED, so
+    hashing terabytes does not evict the page cache (SQLite pages
+    included). A range counts as consumed once the next chunk of the
+    same file is requested.
+    """
+
+    def __init__(self, sizer: AdaptiveChunkSizer | None = None,
+                 fadvise=DEFAULT_FADVISE):
+        self.sizer = sizer or AdaptiveChunkSizer()
+        self.fadvise = fadvise and hasattr(os, "posix_fadvise")
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        self.bytes_read = 0
+        self.read_seconds = 0.0
+
+    def open(self, path: str):
+        handle = open(path, "rb", buffering=0)
+
+        if self.fadvise:
+            _advise(handle, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+
+        return handle
+
+    def close(self, handle):
+        if self.fadvise:
+            _advise(handle, 0, 0, os.POSIX_FADV_DONTNEED)
+            self._local.dropped = (None, 0)
+
+        handle.close()
+
+    def read_chunk(self, handle, size: int | None = None) -> memoryview:
+        size = size or self.sizer.chunk_size
+        view = self._buffer(size)[:size]
+
+        if self.fadvise:
+            self._drop_consumed(handle)
+
+        started = time.perf_counter()
+        nbytes = handle.readinto(view) or 0
+        seconds = time.perf_counter() - started
+
+        self.sizer.record(size, nbytes, seconds)
+
+        with self._lock:
+            self.bytes_read += nbytes
+            self.read_seconds += seconds
+
+        return view[:nbytes]
+
+    def bytes_per_second(self) -> float:
+        """
+        Read throughput over time spent inside read calls only.
+        """
+
+        return self.bytes_read / self.read_seconds if self.read_seconds else 0.0
+
+    def _drop_consumed(self, handle):
+        offset = handle.tell()
+        dropped_handle, dropped_upto = getattr(self._local, "dropped", (None, 0))
+        start = dropped_upto if dropped_handle is handle and dropped_upto <= offset else 0
+
+        if offset > start:
+            _advise(handle, start, offset - start, os.POSIX_FADV_DONTNEED)
+
+        self._local.dropped = (handle, offset)
+
+    def _buffer(self, size: int) -> memoryview:
+        buffer = getattr(self._local, "buffer", None)
+
+        if buffer is None or len(buffer) < size:
+            # A new buffer rather than a resize: views handed out earlier
+            # keep the old one alive until dropped
+            buffer = memoryview(bytearray(size))
+            self._local.buffer = buffer
+
+        return buffer
+
+
+def _advise(handle, offset, length, advice):
+    try:
+        os.posix_fadvise(handle.fileno(), offset, length, advice)
+    except OSError:
+        # Advice is best effort (e.g. not supported by the filesystem)
+        pass
+
+
+_default_reader = None
+
+
+def default_reader() -> ChunkReader:
+    """
+    Process-wide reader for callers without a device-specific one.
+    """
+
+    global _default_reader
+    if _default_reader is None:
+        _default_reader = ChunkReader()
+    return _default_reader
@@ -7,6 +7,7 @@ APP_NAME = "InventoryCollator"
 # -------------------------
 
 DB_FILE = "inventory.db"
+DB_PATH = DB_FILE
 SCHEMA_VERSION = 1
 
 # -------------------------
@@ -39,23 +40,108 @@ DEFAULT_AUDIO_EXTENSIONS = {
     "wma",
 }
 
+AUDIO_EXTENSIONS = {f".{ext}" for ext in DEFAULT_AUDIO_EXTENSIONS}
+
 # -------------------------
 # Hashing Strategy
 # -------------------------
 
 PARTIAL_HASH_SIZE = 8 * 1024 * 1024  # 8 MB
+
+# Partial and full hashes of a row use one algorithm, stored in
+# files.hash_algo; hashes are only compared within the same algorithm.
+# BLAKE2 is faster than SHA-256 on CPUs without SHA extensions.
+HASH_ALGORITHMS = ("sha256", "blake2b", "blake2s")
+DEFAULT_HASH_ALGO = "sha256"
+
+# FLACs carrying a STREAMINFO MD5 (decoded audio checksum) are matched
+# on it; full-file hashing them is skipped unless this is True
+DEFAULT_FLAC_FULL_HASH = False
 HASH_CHUNK_SIZE = 1024 * 1024        # 1 MB chunks
 
+# Read chunk size adapts to measured throughput (see chunk_reader):
+# starts from the device default, then aims for one read per target time
+HASH_CHUNK_MIN = 256 * 1024          # never below TAG_HEAD_SIZE
+HASH_CHUNK_MAX = 8 * 1024 * 1024
+HASH_CHUNK_TARGET_SECONDS = 0.03
+HASH_CHUNK_BY_DEVICE = {
+    "hdd": 4 * 1024 * 1024,
+    "ssd": 1024 * 1024,
+    "network": 256 * 1024,
+    "unknown": 1024 * 1024,
+}
+
+# posix_fadvise SEQUENTIAL / DONTNEED while hashing (Linux), keeping
+# hashed data from evicting the page cache
+DEFAULT_FADVISE = True
+
+# Regions kept in memory for tag parsing during the single file read
+TAG_HEAD_SIZE = 256 * 1024           # 256 KB
+TAG_TAIL_SIZE = 128 * 1024           # 128 KB (ID3v1, APEv2, trailing atoms)
+
 # -------------------------
 # Performance
 # -------------------------
 
 BATCH_COMMIT_SIZE = 100
+BATCH_FLUSH_SECONDS = 5.0
+
+# Hash worker defaults per device kind (see device_info.py)
+DEFAULT_HASH_WORKERS = {
+    "hdd": 1,
+    "ssd": 8,
+    "network": 4,
+    "unknown": 2,
+}
+HASH_QUEUE_PER_WORKER = 4
+
+# Optional process pool for mutagen parsing (0 = parse in the metadata
+# stage thread)
+DEFAULT_METADATA_PROCESSES = 0
+METADATA_BATCH_SIZE = 32
+
+# "precise": mutagen reads whatever it needs. "fast": reads past the
+# leading tags (ID3v2, FLAC metadata blocks) that are not in the cached
+# head/tail regions are capped per file; past the cap, codec info
+# comes from the first frame and the duration is estimated from the
+# bitrate (rows flagged estimated, see MetadataRefinePass)
+METADATA_MODES = ("precise", "fast")
+DEFAULT_METADATA_MODE = "precise"
+FAST_TAG_READ_LIMIT = 1024 * 1024     # 1 MB
+
+# Reuse metadata already extracted for the same file (unchanged row) or
+# the same content elsewhere (see metadata_cache) instead of re-parsing
+DEFAULT_METADATA_CACHE = True
+
+# Optional read scheduler between classify and hash: reorders each
+# window of files by inode or first physical extent (FIEMAP)
+READ_ORDERS = ("off", "inode", "extent")
+DEFAULT_READ_ORDER = "off"
+READ_SCHEDULE_WINDOW = 1000
+
+# Scan pipeline (walk -> classify -> hash -> metadata -> write)
+STAGE_QUEUE_SIZE = 64
+STAGE_REPORT_SECONDS = 30.0
+
+NETWORK_FS_TYPES = {
+    "nfs",
+    "nfs4",
+    "cifs",
+    "smb3",
+    "smbfs",
+    "fuse.sshfs",
+    "9p",
+}
 TEST_MODE_FILE_LIMIT = 100
 
 # -------------------------
 # Defaults
 # -------------------------
 
+RESCAN_MODES = ("skip", "force")
 DEFAULT_RESCAN_MODE = "skip"  # skip | force
 DEFAULT_COMPUTE_FULL_HASH = False
+
+# Re-stat every file even in directories whose mtime and entry count
+# are unchanged (for filesystems with unreliable directory mtimes)
+DEFAULT_DEEP_VERIFY = False
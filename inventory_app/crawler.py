@@ -0,0 +1,147 @@
+import os
+import logging
+from typing import NamedTuple
+
+
+class FileRecord(NamedTuple):
+    full_path: str
+    relative_path: str
+    file_name: str
+    size_bytes: int
+    mtime: float
+    ctime: float
+    inode: int
+
+
+class DirRecord(NamedTuple):
+    relative_dir: str
+    mtime: float
+    child_count: int
+    pruned: bool
+    complete: bool
+    listed: bool = True
+
+
+def walk_key(relative_dir: str) -> tuple:
+    """
+    Sort key giving the position of a directory in walk order: the walk
+    is a preorder over name-sorted entries, so directories come out in
+    the order of their component tuples.
+    """
+
+    return tuple(relative_dir.split("/")) if relative_dir else ()
+
+
+def walk_files(drive_root: str, prune=None, resume_after=None):
+    """
+    Depth-first os.scandir walk yielding a FileRecord per regular file.
+
+    - File type comes from DirEntry.is_file()/is_dir() (d_type on Linux,
+      no syscall); size and times from DirEntry.stat(), which is one
+      stat per file on Linux and free on Windows.
+    - relative_path is built from the directory stack with "/" separators
+      instead of calling os.path.relpath per file.
+    - Entries are visited in name order, so the walk order is the same
+      on every run (see walk_key).
+    - Files of a directory are yielded before its subdirectories are
+      descended into. Symlinked directories are not followed (same as
+      os.walk); symlinks to files are.
+    - After its files, every listed directory yields a DirRecord with
+      its mtime and entry count; complete is False when a file in it
+      (or the directory itself) could not be stat'ed.
+    - A directory that cannot be listed, the drive root included,
+      yields a DirRecord with listed=False and nothing else; its
+      subtree is not walked.
+
+    prune(relative_dir, mtime, child_count) -> bool is asked once per
+    directory. When it returns True the files of that directory are not
+    stat'ed or yielded (the caller serves them from its own records) and
+    the DirRecord comes with pruned=True; subdirectories are still
+    descended into.
+
+    resume_after skips every directory up to and including that one in
+    walk order; subtrees lying entirely before it are not listed at all.
+    """
+
+    resume_key = walk_key(resume_after) if resume_after is not None else None
+
+    stack = [(drive_root, "", _dir_mtime(drive_root))]
+
+    while stack:
+        dir_path, relative_dir, dir_mtime = stack.pop()
+
+        try:
+            with os.scandir(dir_path) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError as e:
+            logging.error(f"Cannot list directory {dir_path}: {e}")
+            yield DirRecord(relative_dir, dir_mtime, 0, False, False, listed=False)
+            continue
+
+        done = resume_key is not None and walk_key(relative_dir) <= resume_key
+        pruned = (not done and prune is not None and dir_mtime is not None and
+                  prune(relative_dir, dir_mtime, len(entries)))
+        complete = dir_mtime is not None
+        subdirs = []
+
+        for entry in entries:
+            relative_path = f"{relative_dir}/{entry.name}" if relative_dir else entry.name
+
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if done and _before_resume_point(relative_path, resume_key):
+                        continue
+
+                    subdirs.append((entry.path, relative_path, _dir_mtime(entry)))
+                    continue
+
+                if done or pruned or not entry.is_file():
+                    continue
+
+                stat = entry.stat()
+
+            except OSError as e:
+                logging.error(f"Cannot stat {entry.path}: {e}")
+                complete = False
+                continue
+
+            yield FileRecord(
+                full_path=entry.path,
+                relative_path=relative_path,
+                file_name=entry.name,
+                size_bytes=stat.st_size,
+                mtime=stat.st_mtime,
+                ctime=stat.st_ctime,
+                inode=stat.st_ino
+            )
+
+        if not done:
+            yield DirRecord(relative_dir, dir_mtime, len(entries), pruned, complete)
+
+        # Reversed so the first subdirectory is popped (visited) first
+        stack.extend(reversed(subdirs))
+
+
+def _dir_mtime(directory):
+    """
+    mtime of a directory (path or DirEntry, not followed), or None when
+    it cannot be stat'ed; the directory is still listed then.
+    """
+
+    try:
+        if isinstance(directory, os.DirEntry):
+            return directory.stat(follow_symlinks=False).st_mtime
+        return os.stat(directory).st_mtime
+    except OSError as e:
+        logging.error(f"Cannot stat directory {getattr(directory, 'path', directory)}: {e}")
+        return None
+
+
+def _before_resume_point(relative_dir, resume_key) -> bool:
+    """
+    True when the whole subtree of relative_dir precedes the resume
+    point in walk order.
+    """
+
+    key = walk_key(relative_dir)
+    return key < resume_key and resume_key[:len(key)] != key
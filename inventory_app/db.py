@@ -1,3 +1,4 @@
+import json
 import sqlite3
 import logging
 from typing import Optional
@@ -5,10 +6,26 @@ from utils import utc_now
 
 
 class Database:
-    def __init__(self, db_path: str):
-        self.conn = sqlite3.connect(db_path)
+    def __init__(self, db_path: str, read_only: bool = False):
+        self.db_path = db_path
+
+        # Scans hand the connection to a dedicated writer thread; it is
+        # never used from two threads at once.
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+
+        # drive_id -> {relative_dir: dir_id}, loaded on first use
+        self._directory_caches = {}
+
+        if read_only:
+            # Lookups from another thread while a scan writes (WAL lets
+            # readers run alongside the writer); the schema is left as is
+            self.conn.execute("PRAGMA query_only=ON;")
+            return
+
         self.conn.execute("PRAGMA journal_mode=WAL;")
+        self.conn.execute("PRAGMA synchronous=NORMAL;")
         self.conn.execute("PRAGMA foreign_keys=ON;")
+
         self.create_tables()
 
     # --------------------------------------------------
@@ -33,6 +50,32 @@ class Database:
         )
         """)
 
+        # Directories (interned once per drive; the root has name '' and
+        # no parent, its children have depth 1)
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS directories (
+            dir_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            drive_id INTEGER NOT NULL,
+            parent_id INTEGER,
+            name TEXT NOT NULL,
+            depth INTEGER NOT NULL,
+            mtime REAL,
+            child_count INTEGER,
+            listed_scan_id INTEGER,
+            FOREIGN KEY(drive_id) REFERENCES drives(drive_id),
+            FOREIGN KEY(parent_id) REFERENCES directories(dir_id)
+        )
+        """)
+
+        cursor.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_directories_parent_name
+        ON directories(drive_id, parent_id, name)
+        """)
+
+        self._add_column_if_missing("directories", "mtime", "REAL")
+        self._add_column_if_missing("directories", "child_count", "INTEGER")
+        self._add_column_if_missing("directories", "listed_scan_id", "INTEGER")
+
         # Files (physical layer)
         cursor.execute("""
         CREATE TABLE IF NOT EXISTS files (
@@ -46,28 +89,71 @@ class Database:
             modified_at_fs TEXT,
             header_valid INTEGER DEFAULT 1,
             sha256 TEXT,
+            partial_hash TEXT,
+            hash_algo TEXT,
+            audio_payload_hash TEXT,
+            flac_md5 TEXT,
             scan_status TEXT DEFAULT 'active',
             first_seen_at TEXT,
             last_seen_at TEXT,
+            last_seen_scan_id INTEGER DEFAULT 0,
+            dir_id INTEGER REFERENCES directories(dir_id),
             FOREIGN KEY(drive_id) REFERENCES drives(drive_id)
         )
         """)
 
+        self._add_column_if_missing("files", "partial_hash", "TEXT")
+        self._add_column_if_missing("files", "last_seen_scan_id", "INTEGER DEFAULT 0")
+        self._add_column_if_missing("files", "dir_id", "INTEGER REFERENCES directories(dir_id)")
+
+        # sha256 holds the full hash, partial_hash the partial hash and
+        # audio_payload_hash the hash of the audio stream without tags,
+        # all computed with hash_algo (NULL when the row has no hash)
+        if self._add_column_if_missing("files", "hash_algo", "TEXT"):
+            # Every hash stored before the column existed is SHA-256
+            cursor.execute("""
+            UPDATE files SET hash_algo = 'sha256'
+            WHERE sha256 IS NOT NULL OR partial_hash IS NOT NULL
+            """)
+
+        self._add_column_if_missing("files", "audio_payload_hash", "TEXT")
+
+        # STREAMINFO MD5 of the decoded audio (FLAC only, from the header)
+        self._add_column_if_missing("files", "flac_md5", "TEXT")
+
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_files_drive ON files(drive_id)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_files_sha ON files(sha256)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_files_path ON files(relative_path)")
+        # Duplicate matching compares partial hashes within one algorithm
+        cursor.execute("DROP INDEX IF EXISTS idx_files_partial_hash")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_files_algo_partial ON files(hash_algo, partial_hash)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_files_payload_hash ON files(audio_payload_hash)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_files_flac_md5 ON files(flac_md5)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_files_drive_seen ON files(drive_id, last_seen_scan_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_files_dir ON files(dir_id)")
 
-        # File Path Components
+        # Scan Runs (one generation per drive scan)
         cursor.execute("""
-        CREATE TABLE IF NOT EXISTS file_path_components (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            file_id INTEGER,
-            component_order INTEGER,
-            component_name TEXT,
-            FOREIGN KEY(file_id) REFERENCES files(file_id)
+        CREATE TABLE IF NOT EXISTS scan_runs (
+            scan_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            drive_id INTEGER,
+            rescan_mode TEXT,
+            status TEXT DEFAULT 'running',
+            started_at TEXT,
+            finished_at TEXT,
+            missing_files INTEGER,
+            checkpoint_dir TEXT,
+            checkpoint_counters TEXT,
+            checkpoint_at TEXT,
+            FOREIGN KEY(drive_id) REFERENCES drives(drive_id)
         )
         """)
 
+        self._add_column_if_missing("scan_runs", "checkpoint_dir", "TEXT")
+        self._add_column_if_missing("scan_runs", "checkpoint_counters", "TEXT")
+        self._add_column_if_missing("scan_runs", "checkpoint_at", "TEXT")
+
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_scan_runs_drive ON scan_runs(drive_id)")
+
         # Audio Metadata
         cursor.execute("""
         CREATE TABLE IF NOT EXISTS file_audio_metadata (
@@ -80,12 +166,183 @@ class Database:
             album TEXT,
             title TEXT,
             year TEXT,
+            estimated INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY(file_id) REFERENCES files(file_id)
+        )
+        """)
+
+        # 1 when read in fast mode with the duration estimated or tags
+        # left out (see metadata_extractor); MetadataRefinePass fixes it
+        self._add_column_if_missing("file_audio_metadata", "estimated", "INTEGER NOT NULL DEFAULT 0")
+
+        # Duplicate Detection (see dedupe.py); a group is one match key
+        # (e.g. a full hash) of one duplicate_type
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS duplicate_groups (
+            group_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            duplicate_type TEXT NOT NULL,
+            hash_algo TEXT NOT NULL,
+            match_key TEXT NOT NULL,
+            size_bytes INTEGER,
+            member_count INTEGER,
+            confidence_score REAL,
+            resolution_status TEXT DEFAULT 'unresolved',
+            first_found_at TEXT,
+            updated_at TEXT
+        )
+        """)
+
+        cursor.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_duplicate_groups_key
+        ON duplicate_groups(duplicate_type, hash_algo, match_key)
+        """)
+
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS duplicate_members (
+            group_id INTEGER,
+            file_id INTEGER,
+            PRIMARY KEY (group_id, file_id),
+            FOREIGN KEY(group_id) REFERENCES duplicate_groups(group_id),
             FOREIGN KEY(file_id) REFERENCES files(file_id)
         )
         """)
 
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_duplicate_members_file ON duplicate_members(file_id)")
+
+        self.conn.commit()
+
+        self._ensure_unique_file_paths()
+        self._ensure_path_components_view()
+
+    def _ensure_unique_file_paths(self):
+        """
+        Creates the UNIQUE (drive_id, relative_path) index.
+
+        Databases from before the index may hold duplicate rows for the
+        same path; for each path the most recently seen row is kept and
+        the others are deleted together with their dependent rows. The
+        old single-column idx_files_path is dropped.
+        """
+
+        exists = self.conn.execute("""
+        SELECT 1 FROM sqlite_master
+        WHERE type = 'index' AND name = 'idx_files_drive_path'
+        """).fetchone()
+
+        if exists:
+            return
+
+        with self.conn:
+            self.conn.execute("""
+            CREATE TEMP TABLE duplicate_file_ids AS
+            SELECT file_id FROM (
+                SELECT file_id,
+                       ROW_NUMBER() OVER (
+                           PARTITION BY drive_id, relative_path
+                           ORDER BY last_seen_at DESC, file_id DESC
+                       ) AS row_rank
+                FROM files
+            )
+            WHERE row_rank > 1
+            """)
+
+            removed = self.conn.execute(
+                "SELECT COUNT(*) FROM duplicate_file_ids"
+            ).fetchone()[0]
+
+            if removed:
+                logging.info(f"Migrating schema: removing {removed} duplicate file rows")
+
+                for table in (*self._legacy_component_tables(), "file_audio_metadata",
+                              "duplicate_members", "files"):
+                    self.conn.execute(f"""
+                    DELETE FROM {table}
+                    WHERE file_id IN (SELECT file_id FROM duplicate_file_ids)
+                    """)
+
+            self.conn.execute("DROP TABLE duplicate_file_ids")
+            self.conn.execute("DROP INDEX IF EXISTS idx_files_path")
+            self.conn.execute("""
+            CREATE UNIQUE INDEX idx_files_drive_path
+            ON files(drive_id, relative_path)
+            """)
+
+    def _legacy_component_tables(self):
+        row = self.conn.execute("""
+        SELECT type FROM sqlite_master WHERE name = 'file_path_components'
+        """).fetchone()
+        return ("file_path_components",) if row and row[0] == "table" else ()
+
+    def _ensure_path_components_view(self):
+        """
+        Replaces the old per-file file_path_components table with a view
+        over the interned directory tree.
+
+        Existing files get their dir_id from relative_path, then the table
+        is dropped. The view keeps (file_id, component_order,
+        component_name) for old queries; it expands every file, so
+        single-file lookups should use get_path_components instead.
+        """
+
+        if self._legacy_component_tables():
+            rows = self.conn.execute("""
+            SELECT file_id, drive_id, relative_path
+            FROM files
+            WHERE dir_id IS NULL
+            """).fetchall()
+
+            logging.info(f"Migrating schema: interning directories for {len(rows)} files")
+
+            try:
+                with self.conn:
+                    self.conn.executemany(
+                        "UPDATE files SET dir_id = ? WHERE file_id = ?",
+                        [
+                            (self.get_directory_id(drive_id, _parent_dir(relative_path)), file_id)
+                            for file_id, drive_id, relative_path in rows
+                        ]
+                    )
+                    self.conn.execute("DROP TABLE file_path_components")
+            except Exception:
+                self._directory_caches.clear()
+                raise
+
+        self.conn.execute("""
+        CREATE VIEW IF NOT EXISTS file_path_components AS
+        WITH RECURSIVE chain(file_id, dir_id, component_order, component_name) AS (
+            SELECT f.file_id, d.parent_id, d.depth - 1, d.name
+            FROM files f
+            JOIN directories d ON d.dir_id = f.dir_id
+            WHERE d.parent_id IS NOT NULL
+            UNION ALL
+            SELECT c.file_id, d.parent_id, d.depth - 1, d.name
+            FROM chain c
+            JOIN directories d ON d.dir_id = c.dir_id
+            WHERE d.parent_id IS NOT NULL
+        )
+        SELECT file_id, component_order, component_name FROM chain
+        UNION ALL
+        SELECT f.file_id, d.depth, f.file_name
+        FROM files f
+        JOIN directories d ON d.dir_id = f.dir_id
+        """)
         self.conn.commit()
 
+    def _add_column_if_missing(self, table, column, definition):
+        """
+        Adds a column to an existing table created by an older schema.
+        Returns True if the column was added.
+        """
+
+        columns = {row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+
+        if column in columns:
+            return False
+
+        logging.info(f"Migrating schema: adding {table}.{column}")
+        self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        return True
+
     # --------------------------------------------------
     # Drive Methods
     # --------------------------------------------------
@@ -131,55 +388,76 @@ class Database:
     def upsert_file(self, drive_id, relative_path, file_name,
                     extension, size_bytes,
                     created_fs, modified_fs,
-                    header_valid, sha256):
+                    header_valid, sha256, partial_hash=None,
+                    scan_id=0, hash_algo=None, audio_payload_hash=None,
+                    flac_md5=None):
 
-        cursor = self.conn.cursor()
+        now = utc_now()
 
-        cursor.execute("""
-        SELECT file_id FROM files
-        WHERE drive_id = ? AND relative_path = ?
-        """, (drive_id, relative_path))
+        try:
+            with self.conn:
+                dir_id = self.get_directory_id(drive_id, _parent_dir(relative_path))
 
-        row = cursor.fetchone()
-        now = utc_now()
+                cursor = self.conn.execute(_UPSERT_FILE_SQL + " RETURNING file_id", (
+                    drive_id, relative_path, file_name,
+                    extension, size_bytes,
+                    created_fs, modified_fs,
+                    header_valid, sha256, partial_hash, hash_algo,
+                    audio_payload_hash, flac_md5, now, now, scan_id, dir_id
+                ))
 
-        if row:
-            file_id = row[0]
-            cursor.execute("""
-            UPDATE files
-            SET size_bytes = ?, modified_at_fs = ?,
-                header_valid = ?, sha256 = ?,
-                scan_status = 'active',
-                last_seen_at = ?
-            WHERE file_id = ?
-            """, (
-                size_bytes, modified_fs,
-                header_valid, sha256,
-                now, file_id
-            ))
-        else:
-            cursor.execute("""
-            INSERT INTO files (
-                drive_id, relative_path, file_name,
-                extension, size_bytes,
-                created_at_fs, modified_at_fs,
-                header_valid, sha256,
-                scan_status, first_seen_at, last_seen_at
-            )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'active', ?, ?)
-            """, (
-                drive_id, relative_path, file_name,
-                extension, size_bytes,
-                created_fs, modified_fs,
-                header_valid, sha256,
-                now, now
-            ))
-            file_id = cursor.lastrowid
+                file_id = cursor.fetchone()[0]
+                cursor.close()
+        except Exception:
+            # Directories inserted by the rolled back transaction are gone
+            self._directory_caches.clear()
+            raise
 
-        self.conn.commit()
         return file_id
 
+    def get_known_files(self, drive_id) -> dict:
+        """
+        Loads a snapshot of every file already recorded for a drive.
+
+        Returns dictionary keyed by relative_path:
+        {
+            relative_path: (file_id, size_bytes, modified_at_fs,
+                            header_valid, sha256, partial_hash,
+                            last_seen_scan_id, hash_algo,
+                            audio_payload_hash, flac_md5, metadata_estimated)
+        }
+
+        metadata_estimated is None for files without a metadata row.
+        """
+
+        cursor = self.conn.cursor()
+        cursor.execute("""
+        SELECT f.relative_path, f.file_id, f.size_bytes, f.modified_at_fs,
+               f.header_valid, f.sha256, f.partial_hash, f.last_seen_scan_id,
+               f.hash_algo, f.audio_payload_hash, f.flac_md5,
+               m.estimated
+        FROM files f
+        LEFT JOIN file_audio_metadata m ON m.file_id = f.file_id
+        WHERE f.drive_id = ?
+        """, (drive_id,))
+
+        return {row[0]: row[1:] for row in cursor}
+
+    def touch_file(self, file_id, scan_id=0):
+        now = utc_now()
+        self.conn.execute("""
+        UPDATE files
+        SET scan_status = 'active', last_seen_at = ?, last_seen_scan_id = ?
+        WHERE file_id = ?
+        """, (now, scan_id, file_id))
+        self.conn.commit()
+
     def mark_all_files_missing(self, drive_id):
+        """
+        Legacy full-drive reset. Scans no longer call this; missing files
+        are derived from scan generations in finalize_missing_files.
+        """
+
         self.conn.execute("""
         UPDATE files
         SET scan_status = 'missing'
@@ -187,62 +465,615 @@ class Database:
         """, (drive_id,))
         self.conn.commit()
 
-    def finalize_missing_files(self, drive_id):
-        self.conn.execute("""
+    def finalize_missing_files(self, drive_id, scan_id) -> int:
+        """
+        Marks every file of the drive not seen by scan_id as missing.
+
+        One UPDATE over idx_files_drive_seen; rows seen in this run carry
+        last_seen_scan_id = scan_id and are never rewritten.
+        Returns the number of rows newly marked missing.
+        """
+
+        cursor = self.conn.execute("""
         UPDATE files
-        SET scan_status = 'active'
+        SET scan_status = 'missing'
+        WHERE drive_id = ?
+          AND last_seen_scan_id < ?
+          AND scan_status != 'missing'
+        """, (drive_id, scan_id))
+        self.conn.commit()
+        return cursor.rowcount
+
+    # --------------------------------------------------
+    # Scan Runs
+    # --------------------------------------------------
+
+    def start_scan_run(self, drive_id, rescan_mode) -> int:
+        """
+        Opens a new scan generation for a drive.
+
+        Runs of the same drive still marked 'running' were cut short
+        (crash, disconnect) and are closed as 'interrupted'; the files
+        they did not reach keep their previous state.
+        """
+
+        now = utc_now()
+
+        with self.conn:
+            self.conn.execute("""
+            UPDATE scan_runs
+            SET status = 'interrupted'
+            WHERE drive_id = ? AND status = 'running'
+            """, (drive_id,))
+
+            cursor = self.conn.execute("""
+            INSERT INTO scan_runs (drive_id, rescan_mode, status, started_at)
+            VALUES (?, ?, 'running', ?)
+            """, (drive_id, rescan_mode, now))
+
+        return cursor.lastrowid
+
+    def get_resumable_scan_run(self, drive_id) -> Optional[tuple]:
+        """
+        Returns (scan_id, rescan_mode, checkpoint_dir, counters) for the
+        latest scan run of a drive if it was interrupted, else None.
+
+        checkpoint_dir is the last directory (in walk order) whose files
+        were all committed, or None if none was; counters is the dict
+        saved with it.
+        """
+
+        row = self.conn.execute("""
+        SELECT scan_id, rescan_mode, status, checkpoint_dir, checkpoint_counters
+        FROM scan_runs
+        WHERE drive_id = ?
+        ORDER BY scan_id DESC
+        LIMIT 1
+        """, (drive_id,)).fetchone()
+
+        if row is None or row[2] not in ("interrupted", "running"):
+            return None
+
+        scan_id, rescan_mode, _, checkpoint_dir, counters = row
+        return scan_id, rescan_mode, checkpoint_dir, json.loads(counters) if counters else {}
+
+    def resume_scan_run(self, scan_id):
+        self.conn.execute("""
+        UPDATE scan_runs
+        SET status = 'running', finished_at = NULL
+        WHERE scan_id = ?
+        """, (scan_id,))
+        self.conn.commit()
+
+    def finish_scan_run(self, scan_id, status, missing_files=None):
+        now = utc_now()
+        self.conn.execute("""
+        UPDATE scan_runs
+        SET status = ?, finished_at = ?, missing_files = ?
+        WHERE scan_id = ?
+        """, (status, now, missing_files, scan_id))
+        self.conn.commit()
+
+    # --------------------------------------------------
+    # Full Hash Pass
+    # --------------------------------------------------
+
+    def get_full_hash_candidates(self, drive_id, include_flac_md5=False) -> list:
+        """
+        Returns (file_id, relative_path, size_bytes, modified_at_fs,
+        hash_algo) for active files on a drive that still lack a full
+        hash while sharing their partial hash with at least one other
+        file in the database (any drive).
+        Partial hashes only match within the same hash_algo. FLACs with
+        a STREAMINFO MD5 are left out unless include_flac_md5 is True.
+
+        Rows that already received a full hash are excluded, so an
+        interrupted pass resumes where it stopped.
+        """
+
+        cursor = self.conn.cursor()
+        cursor.execute("""
+        SELECT file_id, relative_path, size_bytes, modified_at_fs, hash_algo
+        FROM files
         WHERE drive_id = ?
           AND scan_status = 'active'
+          AND sha256 IS NULL
+          AND (? OR flac_md5 IS NULL)
+          AND (hash_algo, partial_hash) IN (
+              SELECT hash_algo, partial_hash
+              FROM files
+              WHERE partial_hash IS NOT NULL
+              GROUP BY hash_algo, partial_hash
+              HAVING COUNT(*) > 1
+          )
+        ORDER BY relative_path
+        """, (drive_id, include_flac_md5))
+
+        return cursor.fetchall()
+
+    def update_full_hashes(self, rows: list):
+        """
+        rows: list of (sha256, audio_payload_hash, file_id)
+        """
+
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE files SET sha256 = ?, audio_payload_hash = ? WHERE file_id = ?",
+                rows
+            )
+
+    # --------------------------------------------------
+    # Duplicate Detection
+    # --------------------------------------------------
+
+    def get_dedupe_scope(self) -> tuple:
+        """
+        Returns (file_count, total_bytes) of the active audio files on
+        all drives: what full-hashing everything would read.
+        """
+
+        return self.conn.execute("""
+        SELECT COUNT(*), COALESCE(SUM(size_bytes), 0)
+        FROM files
+        WHERE scan_status = 'active' AND header_valid = 1
+        """).fetchone()
+
+    def get_same_size_files(self) -> list:
+        """
+        Returns (file_id, drive_id, relative_path, size_bytes,
+        partial_hash, sha256, hash_algo, audio_payload_hash, flac_md5,
+        modified_at_fs) for active, non-empty audio files on any drive sharing their size
+        with another such file, ordered by size.
+        """
+
+        cursor = self.conn.cursor()
+        cursor.execute("""
+        SELECT file_id, drive_id, relative_path, size_bytes,
+               partial_hash, sha256, hash_algo, audio_payload_hash, flac_md5,
+               modified_at_fs
+        FROM files
+        WHERE scan_status = 'active'
+          AND header_valid = 1
+          AND size_bytes IN (
+              SELECT size_bytes
+              FROM files
+              WHERE scan_status = 'active'
+                AND header_valid = 1
+                AND size_bytes > 0
+              GROUP BY size_bytes
+              HAVING COUNT(*) > 1
+          )
+        ORDER BY size_bytes, drive_id, relative_path
         """)
-        self.conn.commit()
+
+        return cursor.fetchall()
+
+    def refresh_duplicate_groups(self, duplicate_type="exact") -> tuple:
+        """
+        Brings the groups of one duplicate_type in line with the files
+        table: one group per match key shared by two or more active
+        files. Groups keep their group_id and resolution_status while
+        their key still matches; groups left with fewer than two files
+        are deleted.
+
+        Returns (group_count, member_count).
+        """
+
+        key, algo, confidence = _DUPLICATE_KEYS[duplicate_type]
+        now = utc_now()
+
+        with self.conn:
+            self.conn.execute("DROP TABLE IF EXISTS temp.duplicate_keys")
+            self.conn.execute(f"""
+            CREATE TEMP TABLE duplicate_keys AS
+            SELECT {algo} AS hash_algo, {key} AS match_key,
+                   MIN(f.size_bytes) AS size_bytes, COUNT(*) AS member_count
+            FROM files f
+            WHERE f.scan_status = 'active'
+              AND {key} IS NOT NULL
+            GROUP BY 1, 2
+            HAVING COUNT(*) > 1
+            """)
+
+            stale_groups = """
+            SELECT group_id FROM duplicate_groups g
+            WHERE duplicate_type = ?
+              AND NOT EXISTS (
+                  SELECT 1 FROM duplicate_keys k
+                  WHERE k.hash_algo = g.hash_algo AND k.match_key = g.match_key
+              )
+            """
+            self.conn.execute(f"DELETE FROM duplicate_members WHERE group_id IN ({stale_groups})",
+                              (duplicate_type,))
+            self.conn.execute(f"DELETE FROM duplicate_groups WHERE group_id IN ({stale_groups})",
+                              (duplicate_type,))
+
+            self.conn.execute("""
+            INSERT INTO duplicate_groups (
+                duplicate_type, hash_algo, match_key, size_bytes,
+                member_count, confidence_score, first_found_at, updated_at
+            )
+            SELECT ?, hash_algo, match_key, size_bytes, member_count, ?, ?, ?
+            FROM duplicate_keys
+            WHERE true
+            ON CONFLICT(duplicate_type, hash_algo, match_key) DO UPDATE SET
+                size_bytes = excluded.size_bytes,
+                member_count = excluded.member_count,
+                updated_at = excluded.updated_at
+            """, (duplicate_type, confidence, now, now))
+
+            # Members whose file changed, moved to another key or went missing
+            self.conn.execute(f"""
+            DELETE FROM duplicate_members
+            WHERE rowid IN (
+                SELECT m.rowid
+                FROM duplicate_members m
+                JOIN duplicate_groups g ON g.group_id = m.group_id
+                LEFT JOIN files f ON f.file_id = m.file_id
+                                 AND f.scan_status = 'active'
+                                 AND {algo} = g.hash_algo
+                                 AND {key} = g.match_key
+                WHERE g.duplicate_type = ? AND f.file_id IS NULL
+            )
+            """, (duplicate_type,))
+
+            self.conn.execute(f"""
+            INSERT OR IGNORE INTO duplicate_members (group_id, file_id)
+            SELECT g.group_id, f.file_id
+            FROM duplicate_groups g
+            JOIN files f ON {key} = g.match_key
+                        AND {algo} = g.hash_algo
+            WHERE g.duplicate_type = ?
+              AND f.scan_status = 'active'
+            """, (duplicate_type,))
+
+            self.conn.execute("DROP TABLE duplicate_keys")
+
+        return self.conn.execute("""
+        SELECT COUNT(*), COALESCE(SUM(member_count), 0)
+        FROM duplicate_groups
+        WHERE duplicate_type = ?
+        """, (duplicate_type,)).fetchone()
+
+    # --------------------------------------------------
+    # Hash Algorithm Migration
+    # --------------------------------------------------
+
+    def get_hash_migration_candidates(self, drive_id, hash_algo) -> list:
+        """
+        Returns (file_id, relative_path, size_bytes, modified_at_fs,
+        has_full_hash) for active files on a drive hashed with another
+        algorithm than hash_algo whose size also occurs among hash_algo
+        rows (any drive). Only those can be duplicates of a hash_algo
+        row, so only they need their hashes recomputed.
+        """
+
+        cursor = self.conn.cursor()
+        cursor.execute("""
+        SELECT file_id, relative_path, size_bytes, modified_at_fs, sha256 IS NOT NULL
+        FROM files
+        WHERE drive_id = ?
+          AND scan_status = 'active'
+          AND hash_algo IS NOT NULL
+          AND hash_algo != ?
+          AND size_bytes IN (
+              SELECT size_bytes
+              FROM files
+              WHERE hash_algo = ?
+          )
+        ORDER BY relative_path
+        """, (drive_id, hash_algo, hash_algo))
+
+        return cursor.fetchall()
+
+    def update_file_hashes(self, rows: list):
+        """
+        rows: list of (partial_hash, sha256, audio_payload_hash,
+        hash_algo, file_id)
+        """
+
+        with self.conn:
+            self.conn.executemany("""
+            UPDATE files
+            SET partial_hash = ?, sha256 = ?, audio_payload_hash = ?, hash_algo = ?
+            WHERE file_id = ?
+            """, rows)
 
     # --------------------------------------------------
     # Path Components
     # --------------------------------------------------
 
+    def get_directory_id(self, drive_id, relative_dir) -> int:
+        """
+        Returns the dir_id of relative_dir ("" for the drive root,
+        "/"-separated otherwise), inserting it and any missing ancestors.
+
+        Lookups go through an in-memory cache, so directories already
+        interned cost no query. Inserts are not committed here; they are
+        part of the caller's transaction.
+        """
+
+        cache = self._directory_cache(drive_id)
+        dir_id = cache.get(relative_dir)
+
+        if dir_id is not None:
+            return dir_id
+
+        if relative_dir:
+            parent_dir, _, name = relative_dir.rpartition("/")
+            parent_id = self.get_directory_id(drive_id, parent_dir)
+            depth = relative_dir.count("/") + 1
+        else:
+            parent_id, name, depth = None, "", 0
+
+        cursor = self.conn.execute("""
+        INSERT INTO directories (drive_id, parent_id, name, depth)
+        VALUES (?, ?, ?, ?)
+        """, (drive_id, parent_id, name, depth))
+
+        cache[relative_dir] = cursor.lastrowid
+        return cursor.lastrowid
+
+    def _directory_cache(self, drive_id) -> dict:
+        cache = self._directory_caches.get(drive_id)
+
+        if cache is None:
+            cache = {path: row[0] for path, row in self._directory_rows(drive_id, "dir_id")}
+            self._directory_caches[drive_id] = cache
+
+        return cache
+
+    def get_known_directories(self, drive_id) -> dict:
+        """
+        Loads the directory state recorded by earlier scans.
+
+        Returns dictionary keyed by relative_dir ("" for the root):
+        {
+            relative_dir: (mtime, child_count, listed_scan_id)
+        }
+        Directories never fully listed are left out.
+        """
+
+        return {
+            path: row
+            for path, row in self._directory_rows(drive_id, "mtime", "child_count", "listed_scan_id")
+            if row[2] is not None
+        }
+
+    def _directory_rows(self, drive_id, *columns):
+        """
+        Yields (relative_dir, (columns...)) for every directory of a
+        drive, rebuilding paths from the parent chain.
+        """
+
+        paths = {}
+
+        # Parents sort before their children
+        rows = self.conn.execute(f"""
+        SELECT dir_id, parent_id, name, {", ".join(columns)}
+        FROM directories
+        WHERE drive_id = ?
+        ORDER BY depth
+        """, (drive_id,))
+
+        for dir_id, parent_id, name, *values in rows:
+            parent_path = paths.get(parent_id, "")
+            path = f"{parent_path}/{name}" if parent_path else name
+            paths[dir_id] = path
+            yield path, tuple(values)
+
     def insert_path_components(self, file_id, relative_path):
-        parts = relative_path.split("/")
+        """
+        Links a file to its interned directory. Only directories not yet
+        known to this drive are inserted.
+        """
 
-        cursor = self.conn.cursor()
+        try:
+            with self.conn:
+                row = self.conn.execute(
+                    "SELECT drive_id FROM files WHERE file_id = ?", (file_id,)
+                ).fetchone()
 
-        cursor.execute("DELETE FROM file_path_components WHERE file_id = ?", (file_id,))
+                if row is None:
+                    return
 
-        for index, part in enumerate(parts):
-            cursor.execute("""
-            INSERT INTO file_path_components
-            (file_id, component_order, component_name)
-            VALUES (?, ?, ?)
-            """, (file_id, index, part))
+                dir_id = self.get_directory_id(row[0], _parent_dir(relative_path))
 
-        self.conn.commit()
+                self.conn.execute(
+                    "UPDATE files SET dir_id = ? WHERE file_id = ? AND dir_id IS NOT ?",
+                    (dir_id, file_id, dir_id)
+                )
+        except Exception:
+            self._directory_caches.clear()
+            raise
+
+    def get_path_components(self, file_id) -> list:
+        """
+        Returns [(component_order, component_name), ...] for one file,
+        directories first and the file name last.
+        """
+
+        cursor = self.conn.execute("""
+        WITH RECURSIVE chain(dir_id, depth, name) AS (
+            SELECT d.parent_id, d.depth, d.name
+            FROM files f
+            JOIN directories d ON d.dir_id = f.dir_id
+            WHERE f.file_id = ? AND d.parent_id IS NOT NULL
+            UNION ALL
+            SELECT d.parent_id, d.depth, d.name
+            FROM chain c
+            JOIN directories d ON d.dir_id = c.dir_id
+            WHERE d.parent_id IS NOT NULL
+        )
+        SELECT depth - 1, name FROM chain
+        UNION ALL
+        SELECT d.depth, f.file_name
+        FROM files f
+        JOIN directories d ON d.dir_id = f.dir_id
+        WHERE f.file_id = ?
+        ORDER BY 1
+        """, (file_id, file_id))
+
+        return cursor.fetchall()
 
     # --------------------------------------------------
     # Audio Metadata
     # --------------------------------------------------
 
-    def upsert_audio_metadata(self, file_id, metadata: dict):
+    def get_cached_metadata(self, hash_algo, partial_hash, size_bytes, modified_fs,
+                            include_estimated=False) -> dict | None:
+        """
+        Audio metadata of any file (any drive) with the same partial
+        hash, size and modification time, i.e. the same content, e.g.
+        a moved, renamed or copied file. None when there is none.
+        Estimated metadata only counts with include_estimated.
+        """
+
         cursor = self.conn.cursor()
+        cursor.execute("""
+        SELECT m.duration_seconds, m.bitrate, m.sample_rate, m.channels,
+               m.artist, m.album, m.title, m.year, m.estimated
+        FROM files f
+        JOIN file_audio_metadata m ON m.file_id = f.file_id
+        WHERE f.hash_algo = ? AND f.partial_hash = ?
+          AND f.size_bytes = ? AND f.modified_at_fs = ?
+          AND (? OR m.estimated = 0)
+        ORDER BY m.estimated
+        LIMIT 1
+        """, (hash_algo, partial_hash, size_bytes, modified_fs, include_estimated))
+
+        row = cursor.fetchone()
+
+        if row is None:
+            return None
 
+        return dict(zip(_METADATA_KEYS, row))
+
+    def upsert_audio_metadata(self, file_id, metadata: dict):
+        self.write_audio_metadata_batch([(file_id, metadata)])
+
+    def write_audio_metadata_batch(self, rows: list):
+        """
+        rows: list of (file_id, metadata dictionary)
+        """
+
+        with self.conn:
+            self.conn.executemany("""
+            INSERT OR REPLACE INTO file_audio_metadata (
+                file_id, duration_seconds, bitrate,
+                sample_rate, channels,
+                artist, album, title, year, estimated
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, [_metadata_row(file_id, metadata) for file_id, metadata in rows])
+
+    def get_estimated_metadata_files(self, drive_id) -> list:
+        """
+        Returns (file_id, relative_path, size_bytes, modified_at_fs) of the
+        active files of a drive whose metadata was estimated by a fast-mode scan.
+        """
+
+        cursor = self.conn.cursor()
         cursor.execute("""
-        INSERT OR REPLACE INTO file_audio_metadata (
-            file_id, duration_seconds, bitrate,
-            sample_rate, channels,
-            artist, album, title, year
-        )
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            file_id,
-            metadata.get("duration"),
-            metadata.get("bitrate"),
-            metadata.get("sample_rate"),
-            metadata.get("channels"),
-            metadata.get("artist"),
-            metadata.get("album"),
-            metadata.get("title"),
-            metadata.get("year")
-        ))
+        SELECT f.file_id, f.relative_path, f.size_bytes, f.modified_at_fs
+        FROM file_audio_metadata m
+        JOIN files f ON f.file_id = m.file_id
+        WHERE m.estimated = 1 AND f.drive_id = ? AND f.scan_status = 'active'
+        ORDER BY f.relative_path
+        """, (drive_id,))
 
-        self.conn.commit()
+        return cursor.fetchall()
+
+    # --------------------------------------------------
+    # Batched Writes
+    # --------------------------------------------------
+
+    def write_file_batch(self, files: list, touched_file_ids: list, scan_id=0,
+                         directories=(), checkpoint=None):
+        """
+        Writes a batch of scanned files inside a single transaction.
+
+        Each entry in files is a dictionary with the upsert_file fields
+        plus "metadata" (audio metadata dictionary, or None).
+
+        Files are written with one executemany UPSERT; dependent rows
+        resolve file_id through the (drive_id, relative_path) key, so no
+        per-file round trip is needed. Directories are interned through
+        the in-memory cache, so only new ones cost an INSERT.
+        touched_file_ids are unchanged files that only need last_seen_at /
+        scan_status refreshed. Every row written is stamped with scan_id.
+
+        directories are (drive_id, relative_dir, mtime, child_count) of
+        directories listed in full by this scan. They are written after
+        the files, so a recorded state never covers unwritten files.
+
+        checkpoint is (checkpoint_dir, counters) saved on the scan run in
+        the same transaction, so it always matches the committed rows.
+        """
+
+        now = utc_now()
+
+        try:
+            self._write_file_batch(files, touched_file_ids, scan_id, now,
+                                   directories, checkpoint)
+        except Exception:
+            self._directory_caches.clear()
+            raise
+
+    def _write_file_batch(self, files, touched_file_ids, scan_id, now,
+                          directories, checkpoint):
+
+        with self.conn:
+            cursor = self.conn.cursor()
+
+            cursor.executemany(_UPSERT_FILE_SQL, [
+                (
+                    f["drive_id"], f["relative_path"], f["file_name"],
+                    f["extension"], f["size_bytes"],
+                    f["created_fs"], f["modified_fs"],
+                    f["header_valid"], f["sha256"], f["partial_hash"],
+                    f["hash_algo"], f["audio_payload_hash"], f["flac_md5"], now, now, scan_id,
+                    self.get_directory_id(f["drive_id"], _parent_dir(f["relative_path"]))
+                )
+                for f in files
+            ])
+
+            cursor.executemany("""
+            INSERT OR REPLACE INTO file_audio_metadata (
+                file_id, duration_seconds, bitrate,
+                sample_rate, channels,
+                artist, album, title, year, estimated
+            )
+            SELECT file_id, ?, ?, ?, ?, ?, ?, ?, ?, ?
+            FROM files
+            WHERE drive_id = ? AND relative_path = ?
+            """, [
+                _metadata_values(f["metadata"]) + (f["drive_id"], f["relative_path"])
+                for f in files if f.get("metadata")
+            ])
+
+            cursor.executemany("""
+            UPDATE files
+            SET scan_status = 'active', last_seen_at = ?, last_seen_scan_id = ?
+            WHERE file_id = ?
+            """, [(now, scan_id, file_id) for file_id in touched_file_ids])
+
+            cursor.executemany("""
+            UPDATE directories
+            SET mtime = ?, child_count = ?, listed_scan_id = ?
+            WHERE dir_id = ?
+            """, [
+                (mtime, child_count, scan_id, self.get_directory_id(drive_id, relative_dir))
+                for drive_id, relative_dir, mtime, child_count in directories
+            ])
+
+            if checkpoint is not None:
+                checkpoint_dir, counters = checkpoint
+                cursor.execute("""
+                UPDATE scan_runs
+                SET checkpoint_dir = ?, checkpoint_counters = ?, checkpoint_at = ?
+                WHERE scan_id = ?
+                """, (checkpoint_dir, json.dumps(counters), now, scan_id))
 
     # --------------------------------------------------
     # Close
@@ -250,3 +1081,66 @@ class Database:
 
     def close(self):
         self.conn.close()
+
+
+# --------------------------------------------------
+# Shared SQL
+# --------------------------------------------------
+
+# Single-statement file write keyed on the unique (drive_id, relative_path)
+# index. Parameters: drive_id, relative_path, file_name, extension,
+# size_bytes, created_at_fs, modified_at_fs, header_valid, sha256,
+# partial_hash, hash_algo, audio_payload_hash, flac_md5, first_seen_at,
+# last_seen_at, last_seen_scan_id, dir_id
+_UPSERT_FILE_SQL = """
+INSERT INTO files (
+    drive_id, relative_path, file_name,
+    extension, size_bytes,
+    created_at_fs, modified_at_fs,
+    header_valid, sha256, partial_hash, hash_algo, audio_payload_hash,
+    flac_md5, scan_status, first_seen_at, last_seen_at, last_seen_scan_id, dir_id
+)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'active', ?, ?, ?, ?)
+ON CONFLICT(drive_id, relative_path) DO UPDATE SET
+    size_bytes = excluded.size_bytes,
+    modified_at_fs = excluded.modified_at_fs,
+    header_valid = excluded.header_valid,
+    sha256 = excluded.sha256,
+    partial_hash = excluded.partial_hash,
+    hash_algo = excluded.hash_algo,
+    audio_payload_hash = excluded.audio_payload_hash,
+    flac_md5 = excluded.flac_md5,
+    scan_status = 'active',
+    last_seen_at = excluded.last_seen_at,
+    last_seen_scan_id = excluded.last_seen_scan_id,
+    dir_id = excluded.dir_id
+"""
+
+
+# duplicate_type -> (SQL expression over files f giving the match key,
+# expression giving its hash algorithm, confidence_score of its groups)
+_DUPLICATE_KEYS = {
+    "exact": ("f.sha256", "f.hash_algo", 1.0),
+    "audio": ("f.audio_payload_hash", "f.hash_algo", 1.0),
+    "flac_md5": ("f.flac_md5", "'md5'", 1.0),
+}
+
+
+def _parent_dir(relative_path: str) -> str:
+    return relative_path.rpartition("/")[0]
+
+
+def _metadata_row(file_id, metadata: dict) -> tuple:
+    return (file_id,) + _metadata_values(metadata)
+
+
+# Metadata dictionary keys (see metadata_extractor), in column order
+_METADATA_KEYS = (
+    "duration", "bitrate", "sample_rate", "channels",
+    "artist", "album", "title", "year", "estimated"
+)
+
+
+def _metadata_values(metadata: dict) -> tuple:
+    return tuple(metadata.get(key) for key in _METADATA_KEYS[:-1]) + \
+        (1 if metadata.get("estimated") else 0,)
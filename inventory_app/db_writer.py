@@ -0,0 +1,178 @@
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+
+from config import BATCH_COMMIT_SIZE, BATCH_FLUSH_SECONDS
+
+
+class BatchWriter:
+    """
+    Buffers scan results and writes them through Database.write_file_batch.
+
+    A flush happens every batch_size files, every flush_interval seconds,
+    and when the writer is closed. Used as a context manager the pending
+    batch is also flushed when the scan loop raises.
+
+    checkpoint, if given, is called at every flush and returns the
+    (checkpoint_dir, counters) committed together with the batch.
+    """
+
+    def __init__(self, db, scan_id=0,
+                 batch_size=BATCH_COMMIT_SIZE,
+                 flush_interval=BATCH_FLUSH_SECONDS,
+                 checkpoint=None):
+        self.db = db
+        self.scan_id = scan_id
+        self.checkpoint = checkpoint
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self.pending_files = []
+        self.pending_touches = []
+        self.pending_directories = []
+        self.last_flush = time.monotonic()
+
+        self.flush_count = 0
+
+    # --------------------------------------------------
+    # Buffering
+    # --------------------------------------------------
+
+    def add_file(self, record: dict):
+        self.pending_files.append(record)
+        self._maybe_flush()
+
+    def touch_file(self, file_id):
+        self.pending_touches.append(file_id)
+        self._maybe_flush()
+
+    def add_directory(self, drive_id, relative_dir, mtime, child_count):
+        self.pending_directories.append((drive_id, relative_dir, mtime, child_count))
+        self._maybe_flush()
+
+    def pending_count(self) -> int:
+        return (len(self.pending_files) + len(self.pending_touches)
+                + len(self.pending_directories))
+
+    def _maybe_flush(self):
+        if self.pending_count() >= self.batch_size:
+            self.flush()
+        elif time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    # --------------------------------------------------
+    # Flush
+    # --------------------------------------------------
+
+    def flush(self):
+        if self.pending_count():
+            self.db.write_file_batch(self.pending_files, self.pending_touches,
+                                     self.scan_id, self.pending_directories,
+                                     self.checkpoint() if self.checkpoint else None)
+            self.flush_count += 1
+
+        self.pending_files = []
+        self.pending_touches = []
+        self.pending_directories = []
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            logging.warning(f"Flushing {self.pending_count()} pending rows after error: {exc}")
+        self.close()
+        return False
+
+
+# --------------------------------------------------
+# Shared Database Thread
+# --------------------------------------------------
+
+class DatabaseThread(threading.Thread):
+    """
+    Sole user of a Database connection while several scanners run at
+    once. Calls are queued and run one at a time in arrival order, so
+    each write_file_batch transaction runs alone on the connection.
+
+    Use through SerializedDatabase, which has the Database interface.
+    """
+
+    def __init__(self, db):
+        super().__init__(name="db-writer", daemon=True)
+        self.db = db
+        self.requests = queue.Queue()
+
+        self.calls = 0
+        self.busy_seconds = 0.0
+
+    def run(self):
+        while True:
+            request = self.requests.get()
+
+            if request is None:
+                return
+
+            future, fn, args, kwargs = request
+
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            started = time.monotonic()
+
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+
+            self.busy_seconds += time.monotonic() - started
+            self.calls += 1
+
+    def call(self, fn, *args, **kwargs):
+        """
+        Runs fn on this thread and returns its result (or raises its
+        exception) in the calling thread.
+        """
+
+        future = Future()
+        self.requests.put((future, fn, args, kwargs))
+        return future.result()
+
+    def close(self):
+        self.requests.put(None)
+        self.join()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class SerializedDatabase:
+    """
+    Database stand-in handed to scanners running concurrently: every
+    method call is executed on the shared DatabaseThread.
+    """
+
+    def __init__(self, thread: DatabaseThread):
+        self._thread = thread
+
+    def __getattr__(self, name):
+        attribute = getattr(self._thread.db, name)
+
+        if not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            return self._thread.call(attribute, *args, **kwargs)
+
+        return call
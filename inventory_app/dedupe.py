@@ -0,0 +1,279 @@
+import os
+import logging
+from itertools import groupby
+from collections import Counter
+
+from config import (
+    BATCH_COMMIT_SIZE, DEFAULT_FADVISE, DEFAULT_HASH_ALGO, PARTIAL_HASH_SIZE,
+    DEFAULT_FLAC_FULL_HASH
+)
+from file_reader import FileContext
+from file_pass import is_unchanged
+from chunk_reader import ChunkReader, AdaptiveChunkSizer
+from utils import human_readable_size
+
+
+class DedupeEngine:
+    """
+    Finds exact duplicates among the audio files of every drive in the
+    database and records them in duplicate_groups / duplicate_members.
+
+    Cascade, each step reading only what the previous one left open:
+    - size         : files with a size no other file has are unique
+                     (database only)
+    - partial hash : within a same-size group, hashes missing or in
+                     another algorithm than the rest of the group are
+                     computed (first PARTIAL_HASH_SIZE bytes)
+    - full hash    : only files sharing a partial hash are read in full
+
+    Files can only be read on the drives given in drive_roots
+    ({drive_id: root}); others are counted as unavailable and keep
+    their group open until their drive is connected. Hashes are stored
+    as they are computed, so a rerun after new scans only reads new or
+    changed files, and the groups are refreshed from the stored hashes.
+
+    Besides these "exact" groups, "audio" groups are refreshed from the
+    stored audio payload hashes, matching copies that differ only in
+    their tags. Retagged copies usually differ in size, so the cascade
+    does not read them; their payload hashes come from every full read
+    (--compute-full-hash scans, FullHashPass, this engine). "flac_md5"
+    groups match FLACs on their STREAMINFO MD5 with no read at all, and
+    such FLACs are not full-hashed unless flac_full_hash is set.
+    """
+
+    def __init__(self, db, drive_roots: dict,
+                 hash_algo=DEFAULT_HASH_ALGO,
+                 batch_size=BATCH_COMMIT_SIZE,
+                 fadvise=DEFAULT_FADVISE,
+                 flac_full_hash=DEFAULT_FLAC_FULL_HASH):
+        self.db = db
+        self.drive_roots = drive_roots
+        self.hash_algo = hash_algo
+        self.flac_full_hash = flac_full_hash
+        self.batch_size = batch_size
+        self.readers = {
+            drive_id: ChunkReader(AdaptiveChunkSizer.for_path(root), fadvise)
+            for drive_id, root in drive_roots.items()
+        }
+
+        self.scope_files = 0
+        self.scope_bytes = 0
+        self.size_candidates = 0
+        self.partial_collisions = 0
+        self.partial_groups = 0
+        self.hashed_files = {"partial": 0, "full": 0}
+        self.read_bytes = {"partial": 0, "full": 0}
+        self.unavailable_files = 0
+        self.flac_md5_skipped = 0
+        self.changed_files = 0
+        self.failed_files = 0
+        self.groups = 0
+        self.members = 0
+        self.audio_groups = 0
+        self.audio_members = 0
+        self.flac_groups = 0
+        self.flac_members = 0
+
+    # --------------------------------------------------
+    # Main Entry
+    # --------------------------------------------------
+
+    def run(self):
+
+        self.scope_files, self.scope_bytes = self.db.get_dedupe_scope()
+
+        candidates = self.db.get_same_size_files()
+        self.size_candidates = len(candidates)
+        logging.info(f"Dedupe: {self.size_candidates} of {self.scope_files} "
+                     f"audio files share their size with another file")
+
+        collisions = self._partial_stage(candidates)
+        self.partial_groups = len(collisions)
+        self.partial_collisions = sum(len(members) for _, members in collisions)
+        logging.info(f"Dedupe: {self.partial_collisions} files in "
+                     f"{self.partial_groups} partial hash collisions")
+
+        self._full_stage(collisions)
+
+        self.groups, self.members = self.db.refresh_duplicate_groups("exact")
+        self.audio_groups, self.audio_members = self.db.refresh_duplicate_groups("audio")
+        self.flac_groups, self.flac_members = self.db.refresh_duplicate_groups("flac_md5")
+
+        self._print_summary()
+
+    # --------------------------------------------------
+    # Partial Hash Stage
+    # --------------------------------------------------
+
+    def _partial_stage(self, candidates) -> list:
+        """
+        Returns the partial hash collisions as (hash_algo, members)
+        with members a list of (file_id, drive_id, relative_path,
+        size_bytes, modified_fs, sha256, flac_md5).
+        """
+
+        partial_groups = {}
+        pending = []
+
+        for size_bytes, rows in groupby(candidates, key=lambda row: row[3]):
+            rows = list(rows)
+            algo = self._group_algo(rows)
+
+            for file_id, drive_id, relative_path, _, partial_hash, sha256, \
+                    hash_algo, payload_hash, flac_md5, modified_fs in rows:
+
+                if partial_hash is None or hash_algo != algo:
+                    hashes = self._hash_file(drive_id, relative_path, size_bytes, modified_fs,
+                                             algo, "partial")
+                    if hashes is None:
+                        continue
+
+                    partial_hash, full_hash, new_payload_hash = hashes
+
+                    if full_hash is not None or hash_algo != algo:
+                        sha256, payload_hash = full_hash, new_payload_hash
+
+                    pending.append((partial_hash, sha256, payload_hash, algo, file_id))
+
+                    if len(pending) >= self.batch_size:
+                        self.db.update_file_hashes(pending)
+                        pending = []
+
+                partial_groups.setdefault((algo, partial_hash), []).append(
+                    (file_id, drive_id, relative_path, size_bytes, modified_fs, sha256, flac_md5)
+                )
+
+        if pending:
+            self.db.update_file_hashes(pending)
+
+        return [
+            (algo, members)
+            for (algo, _), members in partial_groups.items()
+            if len(members) > 1
+        ]
+
+    def _group_algo(self, rows) -> str:
+        """
+        Algorithm a same-size group is compared in: the one most of its
+        partial hashes already use (ties go to hash_algo), so the fewest
+        files are rehashed.
+        """
+
+        counts = Counter(row[6] for row in rows if row[4] is not None)
+
+        if not counts or counts.get(self.hash_algo) == max(counts.values()):
+            return self.hash_algo
+
+        return counts.most_common(1)[0][0]
+
+    # --------------------------------------------------
+    # Full Hash Stage
+    # --------------------------------------------------
+
+    def _full_stage(self, collisions):
+
+        pending = []
+
+        for algo, members in collisions:
+            for file_id, drive_id, relative_path, size_bytes, modified_fs, \
+                    sha256, flac_md5 in members:
+
+                if sha256 is not None:
+                    continue
+
+                if flac_md5 is not None and not self.flac_full_hash:
+                    self.flac_md5_skipped += 1
+                    continue
+
+                hashes = self._hash_file(drive_id, relative_path, size_bytes, modified_fs,
+                                         algo, "full")
+
+                if hashes is None:
+                    continue
+
+                _, sha256, payload_hash = hashes
+                pending.append((sha256, payload_hash, file_id))
+
+                if len(pending) >= self.batch_size:
+                    self.db.update_full_hashes(pending)
+                    pending = []
+                    logging.info(f"Full-hashed {self.hashed_files['full']} files...")
+
+        if pending:
+            self.db.update_full_hashes(pending)
+
+    # --------------------------------------------------
+    # Reading
+    # --------------------------------------------------
+
+    def _hash_file(self, drive_id, relative_path, size_bytes, modified_fs, algo, stage):
+        """
+        Returns (partial_hash, full_hash, audio_payload_hash) of a file;
+        None when it cannot be read. The full and payload hashes are
+        computed in the "full" stage, and in the "partial" stage for
+        files the partial hash reads entirely anyway. Files whose size or
+        mtime changed since their scan are not read.
+        """
+
+        drive_root = self.drive_roots.get(drive_id)
+
+        if drive_root is None:
+            self.unavailable_files += 1
+            return None
+
+        full_path = os.path.join(drive_root, *relative_path.split("/"))
+
+        try:
+            if not is_unchanged(full_path, size_bytes, modified_fs):
+                # Changed since its scan; the next scan updates the row
+                self.changed_files += 1
+                return None
+
+            with FileContext(full_path, size_bytes, self.readers[drive_id]) as ctx:
+                full = stage == "full" or size_bytes <= PARTIAL_HASH_SIZE
+                partial_hash, full_hash = ctx.compute_hashes(full, algo)
+                self.read_bytes[stage] += ctx.bytes_read
+
+        except OSError as e:
+            logging.error(f"Dedupe read failed for {full_path}: {e}")
+            partial_hash = None
+
+        if partial_hash is None:
+            self.failed_files += 1
+            return None
+
+        self.hashed_files[stage] += 1
+        return partial_hash, full_hash, ctx.payload_hash
+
+    # --------------------------------------------------
+    # Summary
+    # --------------------------------------------------
+
+    def _print_summary(self):
+
+        read_bytes = sum(self.read_bytes.values())
+        avoided = max(self.scope_bytes - read_bytes, 0)
+        avoided_share = 100 * avoided / self.scope_bytes if self.scope_bytes else 0.0
+
+        logging.info("========= DEDUPE SUMMARY =========")
+        logging.info(f"Audio files (all drives): {self.scope_files} "
+                     f"({human_readable_size(self.scope_bytes)})")
+        logging.info(f"Same-size candidates : {self.size_candidates}")
+        logging.info(f"Partial collisions   : {self.partial_collisions} files "
+                     f"in {self.partial_groups} groups")
+        logging.info(f"Partial hashes read  : {self.hashed_files['partial']} "
+                     f"({human_readable_size(self.read_bytes['partial'])})")
+        logging.info(f"Full hashes read     : {self.hashed_files['full']} "
+                     f"({human_readable_size(self.read_bytes['full'])})")
+        logging.info(f"FLAC MD5, not read   : {self.flac_md5_skipped}")
+        logging.info(f"Unavailable (drive not connected): {self.unavailable_files}")
+        logging.info(f"Changed since scan   : {self.changed_files}")
+        logging.info(f"Failed reads         : {self.failed_files}")
+        logging.info(f"Duplicate groups     : {self.groups} ({self.members} files)")
+        logging.info(f"Same-audio groups    : {self.audio_groups} ({self.audio_members} files, "
+                     f"tags ignored)")
+        logging.info(f"FLAC MD5 groups      : {self.flac_groups} ({self.flac_members} files, no read)")
+        logging.info(f"I/O performed        : {human_readable_size(read_bytes)}")
+        logging.info(f"I/O avoided          : {human_readable_size(avoided)} "
+                     f"({avoided_share:.1f}% of full-hashing every file)")
+        logging.info("==================================")
@@ -0,0 +1,145 @@
+import os
+import logging
+
+from config import DEFAULT_HASH_WORKERS, NETWORK_FS_TYPES
+
+
+# --------------------------------------------------
+# Device Kind Detection
+# --------------------------------------------------
+
+def detect_device_kind(path: str) -> str:
+    """
+    Best-effort classification of the storage behind a path.
+
+    Returns one of: "hdd", "ssd", "network", "unknown".
+    Detection uses /proc/mounts and /sys on Linux; other platforms
+    report "unknown".
+    """
+
+    try:
+        fs_type = _mount_fs_type(path)
+        if fs_type in NETWORK_FS_TYPES:
+            return "network"
+
+        rotational = _block_device_rotational(path)
+        if rotational is None:
+            return "unknown"
+
+        return "hdd" if rotational else "ssd"
+
+    except Exception as e:
+        logging.debug(f"Device detection failed for {path}: {e}")
+        return "unknown"
+
+
+def default_hash_workers(path: str) -> int:
+    """
+    Hash worker count suited to the device behind a path: one reader
+    per spindle, more for flash and for latency-bound network shares.
+    """
+
+    kind = detect_device_kind(path)
+    workers = DEFAULT_HASH_WORKERS[kind]
+
+    if kind == "ssd":
+        workers = min(workers, os.cpu_count() or 1)
+
+    return max(1, workers)
+
+
+# --------------------------------------------------
+# Physical Device Grouping
+# --------------------------------------------------
+
+def physical_device_id(path: str) -> str:
+    """
+    Best-effort identifier of the physical device behind a path.
+
+    On Linux partitions fold into their whole disk ("sda1" -> "sda"),
+    so two roots on one spindle share an id. Elsewhere (and for network
+    or virtual filesystems) the st_dev of the path is used.
+    """
+
+    st_dev = os.stat(path).st_dev
+
+    try:
+        disk = _block_device_disk(st_dev)
+        if disk:
+            return disk
+    except Exception as e:
+        logging.debug(f"Block device lookup failed for {path}: {e}")
+
+    return f"dev:{st_dev}"
+
+
+def group_roots_by_device(roots: list) -> dict:
+    """
+    Returns {device_id: [root, ...]} keeping the given root order.
+    """
+
+    groups = {}
+
+    for root in roots:
+        groups.setdefault(physical_device_id(root), []).append(root)
+
+    return groups
+
+
+# --------------------------------------------------
+# Linux Helpers
+# --------------------------------------------------
+
+def _block_device_disk(st_dev) -> str | None:
+    sys_path = f"/sys/dev/block/{os.major(st_dev)}:{os.minor(st_dev)}"
+
+    if not os.path.exists(sys_path):
+        return None
+
+    device_dir = os.path.realpath(sys_path)
+
+    if os.path.exists(os.path.join(device_dir, "partition")):
+        device_dir = os.path.dirname(device_dir)
+
+    return os.path.basename(device_dir)
+
+
+def _mount_fs_type(path: str) -> str | None:
+    if not os.path.exists("/proc/mounts"):
+        return None
+
+    real_path = os.path.realpath(path)
+    best_mount, best_type = "", None
+
+    with open("/proc/mounts", "r", encoding="utf-8") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) < 3:
+                continue
+
+            mount_point = parts[1].replace("\\040", " ")
+
+            if real_path == mount_point or real_path.startswith(mount_point.rstrip("/") + "/"):
+                if len(mount_point) >= len(best_mount):
+                    best_mount, best_type = mount_point, parts[2]
+
+    return best_type
+
+
+def _block_device_rotational(path: str) -> bool | None:
+    st_dev = os.stat(path).st_dev
+    sys_path = f"/sys/dev/block/{os.major(st_dev)}:{os.minor(st_dev)}"
+
+    if not os.path.exists(sys_path):
+        return None
+
+    device_dir = os.path.realpath(sys_path)
+
+    # Partitions keep queue/ on the parent disk
+    for candidate in (device_dir, os.path.dirname(device_dir)):
+        flag_path = os.path.join(candidate, "queue", "rotational")
+        if os.path.exists(flag_path):
+            with open(flag_path, "r", encoding="utf-8") as f:
+                return f.read().strip() == "1"
+
+    return None
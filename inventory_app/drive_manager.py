@@ -96,3 +96,18 @@ def detect_or_register_drive(db, drive_root: str, force_new: bool = False):
         logging.info("Drive stats updated.")
 
     return drive_id, drive_key
+
+
+def lookup_drive_id(db, drive_root: str):
+    """
+    drive_id of a mounted drive already registered in the database, or
+    None. Unlike detect_or_register_drive, never writes a key file or
+    registers the drive.
+    """
+
+    key_data = read_drive_key_file(drive_root)
+
+    if not key_data:
+        return None
+
+    return db.get_drive_id_by_key(key_data["drive_key"])
@@ -0,0 +1,108 @@
+import os
+import logging
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+from config import BATCH_COMMIT_SIZE
+
+
+class FilePass(ABC):
+    """
+    Base of the passes that revisit files of one drive listed by the
+    database (full hashes, hash migration, metadata refinement).
+
+    Candidates are (file_id, relative_path, size_bytes, modified_at_fs,
+    *extra) rows. A file whose size or mtime differs from its row
+    changed since its scan and is left for the next scan (a retag often
+    keeps the size, thanks to tag padding). process() does the work and
+    returns a result row, or None on failure; results are committed
+    every batch_size files. Finished rows are not selected again, so a
+    pass can be interrupted and rerun.
+
+    Subclasses set pass_name and implement candidates(), process(),
+    commit() and _print_summary(); a subclass missing one cannot be
+    constructed.
+    """
+
+    pass_name = "File pass"
+
+    def __init__(self, db, drive_id, drive_root, batch_size=BATCH_COMMIT_SIZE):
+        self.db = db
+        self.drive_id = drive_id
+        self.drive_root = drive_root
+        self.batch_size = batch_size
+
+        self.processed_files = 0
+        self.changed_files = 0
+        self.failed_files = 0
+
+    def run(self):
+
+        candidates = self.candidates()
+        logging.info(f"{self.pass_name}: {len(candidates)} candidates")
+
+        pending = []
+
+        for file_id, relative_path, size_bytes, modified_fs, *extra in candidates:
+
+            full_path = os.path.join(self.drive_root, *relative_path.split("/"))
+
+            try:
+                if not is_unchanged(full_path, size_bytes, modified_fs):
+                    self.changed_files += 1
+                    continue
+
+                row = self.process(file_id, full_path, size_bytes, *extra)
+
+            except OSError as e:
+                logging.error(f"{self.pass_name} failed for {full_path}: {e}")
+                row = None
+
+            if row is None:
+                self.failed_files += 1
+                continue
+
+            pending.append(row)
+            self.processed_files += 1
+
+            if len(pending) >= self.batch_size:
+                self.commit(pending)
+                pending = []
+                logging.info(f"{self.pass_name}: {self.processed_files} files done...")
+
+        if pending:
+            self.commit(pending)
+
+        self._print_summary()
+
+    @abstractmethod
+    def candidates(self) -> list:
+        """
+        Candidate rows, as described above.
+        """
+
+    @abstractmethod
+    def process(self, file_id, full_path, size_bytes, *extra):
+        """
+        Works on one unchanged file; returns the row to commit, or None
+        when the file failed.
+        """
+
+    @abstractmethod
+    def commit(self, rows: list):
+        """
+        Writes a batch of rows returned by process().
+        """
+
+    @abstractmethod
+    def _print_summary(self):
+        """
+        Logs the counters at the end of run().
+        """
+
+
+def is_unchanged(full_path: str, size_bytes: int, modified_fs: str) -> bool:
+    stat = os.stat(full_path)
+    # Same representation as the scanner stores
+    return stat.st_size == size_bytes and \
+        datetime.fromtimestamp(stat.st_mtime).isoformat() == modified_fs
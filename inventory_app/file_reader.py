@@ -0,0 +1,332 @@
+import io
+import struct
+import logging
+
+from config import PARTIAL_HASH_SIZE, TAG_HEAD_SIZE, TAG_TAIL_SIZE, DEFAULT_HASH_ALGO
+from audio_detector import is_valid_audio_header
+from audio_payload import locate_payload, tag_region_end, PayloadHasher
+from chunk_reader import default_reader
+from hasher import new_hash, partial_hash_trailer
+
+
+# --------------------------------------------------
+# Per-File Processing Context
+# --------------------------------------------------
+
+class FileContext:
+    """
+    Opens a file once and shares that read across:
+    - header validation (sniffed from the first buffer)
+    - partial / full hashing (fed the same buffers), plus the audio
+      payload hash; both whenever the whole file is read
+    - tag parsing (head and tail regions kept in memory and handed to
+      the metadata stage)
+
+    Chunks are read into the reader's reusable per-thread buffer; only
+    the head and tail regions are copied out.
+
+    Usage:
+        with FileContext(full_path, size_bytes) as ctx:
+            if ctx.is_valid_audio():
+                partial_hash, full_hash = ctx.compute_hashes()
+                head, tail = ctx.tag_regions()
+    """
+
+    def __init__(self, full_path: str, size_bytes: int, reader=None):
+        self.full_path = full_path
+        self.size_bytes = size_bytes
+        self.reader = reader or default_reader()
+
+        self.handle = None
+        self.first_chunk = None
+        self.first_length = 0
+        self.head = b""
+        self.tail = None
+        self.bytes_read = 0
+        self.payload_hash = None
+
+    def __enter__(self):
+        self.handle = self.reader.open(self.full_path)
+
+        try:
+            # View into the reader's buffer, valid until the next read
+            self.first_chunk = self.reader.read_chunk(
+                self.handle, max(self.reader.sizer.chunk_size, TAG_HEAD_SIZE)
+            )
+        except BaseException:
+            # __exit__ does not run when __enter__ raises
+            self.reader.close(self.handle)
+            raise
+        self.first_length = len(self.first_chunk)
+        self.bytes_read = self.first_length
+        self.head = bytes(self.first_chunk[:TAG_HEAD_SIZE])
+
+        if self.first_length >= self.size_bytes:
+            # Whole file in one read
+            self.tail = bytes(self.first_chunk[-TAG_TAIL_SIZE:])
+
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.first_chunk = None
+        self.reader.close(self.handle)
+        return False
+
+    # --------------------------------------------------
+    # Header
+    # --------------------------------------------------
+
+    def is_valid_audio(self) -> bool:
+        return is_valid_audio_header(self.full_path, self.head[:16])
+
+    # --------------------------------------------------
+    # Hashing
+    # --------------------------------------------------
+
+    def compute_hashes(self, compute_full_hash: bool = False,
+                       algo: str = DEFAULT_HASH_ALGO):
+        """
+        Returns (partial_hash, full_hash) in algo from one sequential read.
+
+        full_hash is None unless compute_full_hash is True or the file is
+        no larger than PARTIAL_HASH_SIZE (read whole for the partial hash
+        anyway). When the whole file is read, the tail region is captured
+        on the way and payload_hash is set to the hash (in algo) of the
+        audio stream alone, without tags (see audio_payload); it stays
+        None for unrecognized formats.
+        """
+
+        partial = new_hash(algo)
+        whole_file = compute_full_hash or self.size_bytes <= PARTIAL_HASH_SIZE
+        full = new_hash(algo) if whole_file else None
+        payload = None
+
+        try:
+            if full is not None:
+                payload = self._payload_hasher(algo)
+
+            position = 0
+            chunk = self.first_chunk
+            tail_start = max(0, self.size_bytes - TAG_TAIL_SIZE)
+            tail = bytearray()
+
+            while chunk:
+                if position < PARTIAL_HASH_SIZE:
+                    partial.update(chunk[:PARTIAL_HASH_SIZE - position])
+                if full is not None:
+                    full.update(chunk)
+                if payload is not None:
+                    payload.update(position, chunk)
+
+                if self.tail is None and position + len(chunk) > tail_start:
+                    tail += chunk[max(0, tail_start - position):]
+                    if len(tail) > 2 * TAG_TAIL_SIZE:
+                        # File grew since it was stat'ed
+                        del tail[:-TAG_TAIL_SIZE]
+
+                position += len(chunk)
+
+                if full is None and position >= PARTIAL_HASH_SIZE:
+                    break
+
+                chunk = self.reader.read_chunk(self.handle)
+                self.bytes_read += len(chunk)
+
+            if self.tail is None and position >= self.size_bytes:
+                self.tail = bytes(tail[-TAG_TAIL_SIZE:])
+
+            if payload is not None and position == self.size_bytes:
+                self.payload_hash = payload.hexdigest(self.tail)
+
+            partial.update(partial_hash_trailer(self.size_bytes))
+
+            return partial.hexdigest(), full.hexdigest() if full else None
+
+        except Exception as e:
+            logging.error(f"Hashing failed for {self.full_path}: {e}")
+            return None, None
+
+    def _payload_hasher(self, algo):
+        try:
+            layout = locate_payload(self._read_at, self.size_bytes)
+        except (struct.error, ValueError) as e:
+            logging.warning(f"Unparseable audio container in {self.full_path}: {e}")
+            return None
+
+        return PayloadHasher(algo, layout, self.size_bytes) if layout else None
+
+    def _read_at(self, offset, length):
+        """
+        Reads container structure for locate_payload: from the first
+        chunk when it covers the range, else with a short seek that
+        leaves the sequential read position unchanged.
+        """
+
+        if offset + length <= self.first_length:
+            return bytes(self.first_chunk[offset:offset + length])
+
+        position = self.handle.tell()
+        try:
+            self.handle.seek(offset)
+            data = self.handle.read(length)
+        finally:
+            self.handle.seek(position)
+
+        self.bytes_read += len(data)
+        return data
+
+    # --------------------------------------------------
+    # Tag Parsing
+    # --------------------------------------------------
+
+    def tag_regions(self):
+        """
+        Returns (head, tail) bytes so tags can be parsed after this
+        context is closed (see HeadTailFile).
+        """
+
+        if self.tail is None:
+            self._capture_tail()
+
+        return self.head, self.tail
+
+    def _capture_tail(self):
+        self.handle.seek(max(0, self.size_bytes - TAG_TAIL_SIZE))
+        self.tail = self.handle.read(TAG_TAIL_SIZE)
+        self.bytes_read += len(self.tail)
+
+
+# --------------------------------------------------
+# Head / Tail File View
+# --------------------------------------------------
+
+class ReadLimitExceeded(OSError):
+    """
+    Raised by HeadTailFile when a read would go past its read_limit.
+    """
+
+
+class HeadTailFile(io.RawIOBase):
+    """
+    Read-only, seekable file object for mutagen.
+
+    Reads inside the cached head and tail regions are served from memory.
+    Anything else goes to the fallback handle, which is opened lazily
+    from name when no shared handle was given.
+
+    read_limit caps the bytes read through the fallback handle past the
+    leading tag region (ID3v2 tags, FLAC metadata blocks), which is
+    always read in full: large cover art costs one read, while frame
+    scans and seeks into the audio are bounded. A read that would
+    exceed the limit raises ReadLimitExceeded without touching the file
+    and sets limit_exceeded (parsers may wrap the exception).
+    """
+
+    def __init__(self, name, size, head, tail, fallback=None, read_limit=None):
+        super().__init__()
+        self.name = name
+        self.size = size
+        self.head = head
+        self.tail = tail
+        self.tail_offset = size - len(tail)
+
+        self._fallback = fallback
+        self._owns_fallback = False
+        self._position = 0
+        self.read_limit = read_limit
+        self._tags_end = None
+
+        self.fallback_reads = 0
+        self.fallback_bytes = 0
+        self.limited_bytes = 0
+        self.limit_exceeded = False
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+
+        if position < 0:
+            raise OSError(f"Negative seek position {position}")
+
+        self._position = position
+        return position
+
+    def readinto(self, buffer):
+        data = self._read_at(self._position, len(buffer))
+        buffer[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+    def _read_at(self, offset, length):
+        end = min(offset + length, self.size)
+
+        if offset >= end:
+            return b""
+
+        if end <= len(self.head):
+            return self.head[offset:end]
+
+        if offset >= self.tail_offset:
+            return self.tail[offset - self.tail_offset:end - self.tail_offset]
+
+        limited = 0
+
+        if self.read_limit is not None:
+            limited = max(0, end - max(offset, self._tag_region_end()))
+
+            if self.limited_bytes + limited > self.read_limit:
+                self.limit_exceeded = True
+                raise ReadLimitExceeded(f"Read of {end - offset} bytes at {offset} exceeds "
+                                        f"the {self.read_limit} byte limit: {self.name}")
+
+        handle = self._fallback_handle()
+        handle.seek(offset)
+        self.fallback_reads += 1
+        self.fallback_bytes += end - offset
+        self.limited_bytes += limited
+        return handle.read(end - offset)
+
+    def _tag_region_end(self) -> int:
+        if self._tags_end is None:
+            # Block headers read on the way count against the limit
+            self._tags_end = 0
+            try:
+                self._tags_end = tag_region_end(self._read_at, self.size)
+            except OSError:
+                pass
+
+        return self._tags_end
+
+    def read_at(self, offset, length):
+        """
+        Reads without moving the position, within the same limit.
+        """
+
+        return self._read_at(offset, length)
+
+    def _fallback_handle(self):
+        if self._fallback is None:
+            self._fallback = open(self.name, "rb")
+            self._owns_fallback = True
+        return self._fallback
+
+    def close(self):
+        if self._owns_fallback and self._fallback is not None:
+            self._fallback.close()
+            self._fallback = None
+        super().close()
@@ -0,0 +1,107 @@
+import logging
+
+from config import BATCH_COMMIT_SIZE, DEFAULT_FADVISE, DEFAULT_HASH_ALGO, DEFAULT_FLAC_FULL_HASH
+from file_reader import FileContext
+from file_pass import FilePass
+from chunk_reader import ChunkReader, AdaptiveChunkSizer
+from utils import human_readable_size
+
+
+class FullHashPass(FilePass):
+    """
+    Computes full hashes for files on one drive whose partial hashes
+    collide with another file in the database.
+
+    Runs separately from the crawl. Each full hash uses the algorithm of
+    the row's partial hash, so it compares with the rest of its group;
+    the audio payload hash is computed in the same read. Only rows
+    without a full hash are selected (see FilePass).
+
+    FLACs with a STREAMINFO MD5 are skipped unless flac_full_hash is set.
+    """
+
+    pass_name = "Full hash pass"
+
+    def __init__(self, db, drive_id, drive_root,
+                 batch_size=BATCH_COMMIT_SIZE,
+                 fadvise=DEFAULT_FADVISE,
+                 flac_full_hash=DEFAULT_FLAC_FULL_HASH):
+        super().__init__(db, drive_id, drive_root, batch_size)
+        self.flac_full_hash = flac_full_hash
+        self.reader = ChunkReader(AdaptiveChunkSizer.for_path(drive_root), fadvise)
+
+        self.hashed_bytes = 0
+
+    def candidates(self) -> list:
+        return self.db.get_full_hash_candidates(self.drive_id, self.flac_full_hash)
+
+    def process(self, file_id, full_path, size_bytes, hash_algo):
+        with FileContext(full_path, size_bytes, self.reader) as ctx:
+            _, full_hash = ctx.compute_hashes(True, hash_algo)
+            self.hashed_bytes += ctx.bytes_read
+
+        return (full_hash, ctx.payload_hash, file_id) if full_hash is not None else None
+
+    def commit(self, rows: list):
+        self.db.update_full_hashes(rows)
+
+    def _print_summary(self):
+
+        logging.info("======== FULL HASH SUMMARY ========")
+        logging.info(f"Files hashed        : {self.processed_files}")
+        logging.info(f"Changed since scan  : {self.changed_files}")
+        logging.info(f"Files failed        : {self.failed_files}")
+        logging.info(f"Total size hashed   : {human_readable_size(self.hashed_bytes)}")
+        logging.info(f"Read throughput     : {human_readable_size(self.reader.bytes_per_second())}/s "
+                     f"(chunk size {human_readable_size(self.reader.sizer.chunk_size)})")
+        logging.info("===================================")
+
+
+class HashMigrationPass(FilePass):
+    """
+    Brings rows of one drive hashed with another algorithm over to
+    hash_algo, so they can be matched against rows already in it.
+
+    Only rows whose size occurs among hash_algo rows are rehashed; no
+    other row can be a duplicate of one. The partial hash is recomputed
+    and, for rows that had one, the full and audio payload hashes too,
+    in a single read. Converted rows are not selected again.
+    """
+
+    pass_name = "Hash migration"
+
+    def __init__(self, db, drive_id, drive_root,
+                 hash_algo=DEFAULT_HASH_ALGO,
+                 batch_size=BATCH_COMMIT_SIZE,
+                 fadvise=DEFAULT_FADVISE):
+        super().__init__(db, drive_id, drive_root, batch_size)
+        self.hash_algo = hash_algo
+        self.reader = ChunkReader(AdaptiveChunkSizer.for_path(drive_root), fadvise)
+
+        self.hashed_bytes = 0
+
+    def candidates(self) -> list:
+        return self.db.get_hash_migration_candidates(self.drive_id, self.hash_algo)
+
+    def process(self, file_id, full_path, size_bytes, has_full_hash):
+        with FileContext(full_path, size_bytes, self.reader) as ctx:
+            partial_hash, full_hash = ctx.compute_hashes(bool(has_full_hash), self.hash_algo)
+            self.hashed_bytes += ctx.bytes_read
+
+        if partial_hash is None or (has_full_hash and full_hash is None):
+            return None
+
+        return partial_hash, full_hash, ctx.payload_hash, self.hash_algo, file_id
+
+    def commit(self, rows: list):
+        self.db.update_file_hashes(rows)
+
+    def _print_summary(self):
+
+        logging.info("====== HASH MIGRATION SUMMARY =====")
+        logging.info(f"Target algorithm    : {self.hash_algo}")
+        logging.info(f"Files converted     : {self.processed_files}")
+        logging.info(f"Changed since scan  : {self.changed_files}")
+        logging.info(f"Files failed        : {self.failed_files}")
+        logging.info(f"Total size hashed   : {human_readable_size(self.hashed_bytes)}")
+        logging.info("===================================")
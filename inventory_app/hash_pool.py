@@ -0,0 +1,46 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from config import HASH_QUEUE_PER_WORKER
+
+
+class OrderedWorkPool:
+    """
+    Thread pool that maps a function over a stream of items and yields
+    the results in input order.
+
+    At most workers * HASH_QUEUE_PER_WORKER items are in flight; the
+    input iterator is only advanced as results are consumed, so memory
+    stays flat no matter how many files the crawler produces.
+
+    hashlib releases the GIL on large updates, so file reads and hashing
+    in the workers overlap with each other and with the calling thread.
+    """
+
+    def __init__(self, workers: int, name: str = "hash"):
+        self.workers = workers
+        self.max_pending = workers * HASH_QUEUE_PER_WORKER
+        self.executor = ThreadPoolExecutor(max_workers=workers,
+                                           thread_name_prefix=name)
+
+    def map(self, fn, items):
+        pending = deque()
+
+        for item in items:
+            pending.append(self.executor.submit(fn, item))
+
+            if len(pending) >= self.max_pending:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -1,11 +1,26 @@
+import os
 import hashlib
 import logging
-from config import HASH_CHUNK_SIZE
+from config import PARTIAL_HASH_SIZE, HASH_ALGORITHMS, DEFAULT_HASH_ALGO
+from chunk_reader import default_reader
 
 
-def compute_sha256(file_path: str, test_mode: bool = False) -> str | None:
+def new_hash(algo: str = DEFAULT_HASH_ALGO):
     """
-    Computes SHA256 hash of a file using chunked reading.
+    Returns a hashlib object for one of HASH_ALGORITHMS.
+    """
+
+    if algo not in HASH_ALGORITHMS:
+        raise ValueError(f"Unsupported hash algorithm: {algo}")
+
+    return hashlib.new(algo)
+
+
+def compute_full_hash(file_path: str, algo: str = DEFAULT_HASH_ALGO,
+                      test_mode: bool = False, reader=None) -> str | None:
+    """
+    Computes the full-file hash with algo using chunked reading into
+    the reusable buffer of reader (default: the process-wide ChunkReader).
 
     If test_mode is True, hashing is skipped (returns None).
     """
@@ -13,18 +28,85 @@ def compute_sha256(file_path: str, test_mode: bool = False) -> str | None:
     if test_mode:
         return None
 
-    sha256 = hashlib.sha256()
+    reader = reader or default_reader()
+    digest = new_hash(algo)
 
     try:
-        with open(file_path, "rb") as f:
+        f = reader.open(file_path)
+        try:
             while True:
-                chunk = f.read(HASH_CHUNK_SIZE)
+                chunk = reader.read_chunk(f)
                 if not chunk:
                     break
-                sha256.update(chunk)
+                digest.update(chunk)
+        finally:
+            reader.close(f)
 
-        return sha256.hexdigest()
+        return digest.hexdigest()
 
     except Exception as e:
         logging.error(f"Hashing failed for {file_path}: {e}")
         return None
+
+
+def compute_sha256(file_path: str, test_mode: bool = False,
+                   reader=None) -> str | None:
+    """
+    Computes SHA256 hash of a file (see compute_full_hash).
+    """
+
+    return compute_full_hash(file_path, "sha256", test_mode, reader)
+
+
+def compute_partial_hash(file_path: str, size_bytes: int | None = None,
+                         test_mode: bool = False, reader=None,
+                         algo: str = DEFAULT_HASH_ALGO) -> str | None:
+    """
+    Computes the partial hash used for first-pass identity:
+
+        HASH(first PARTIAL_HASH_SIZE bytes + file size)
+
+    The size is appended as its decimal string so files sharing a prefix
+    but differing in length never collide.
+
+    If test_mode is True, hashing is skipped (returns None).
+    """
+
+    if test_mode:
+        return None
+
+    reader = reader or default_reader()
+    digest = new_hash(algo)
+
+    try:
+        if size_bytes is None:
+            size_bytes = os.path.getsize(file_path)
+
+        remaining = PARTIAL_HASH_SIZE
+
+        f = reader.open(file_path)
+        try:
+            while remaining > 0:
+                chunk = reader.read_chunk(f, min(reader.sizer.chunk_size, remaining))
+                if not chunk:
+                    break
+                digest.update(chunk)
+                remaining -= len(chunk)
+        finally:
+            reader.close(f)
+
+        digest.update(partial_hash_trailer(size_bytes))
+
+        return digest.hexdigest()
+
+    except Exception as e:
+        logging.error(f"Partial hashing failed for {file_path}: {e}")
+        return None
+
+
+def partial_hash_trailer(size_bytes: int) -> bytes:
+    """
+    Bytes appended after the leading region when computing a partial hash.
+    """
+
+    return str(size_bytes).encode("ascii")
@@ -1,12 +1,151 @@
 import os
 import sys
 import logging
+import argparse
 
-from config import DB_PATH
+from config import (
+    APP_NAME, DB_PATH,
+    RESCAN_MODES, DEFAULT_RESCAN_MODE, DEFAULT_COMPUTE_FULL_HASH,
+    DEFAULT_METADATA_PROCESSES, DEFAULT_DEEP_VERIFY,
+    READ_ORDERS, DEFAULT_READ_ORDER, READ_SCHEDULE_WINDOW, DEFAULT_FADVISE,
+    HASH_ALGORITHMS, DEFAULT_HASH_ALGO, DEFAULT_FLAC_FULL_HASH,
+    DEFAULT_METADATA_CACHE, METADATA_MODES, DEFAULT_METADATA_MODE
+)
 from utils import setup_logging
 from db import Database
-from drive_manager import detect_or_register_drive
+from drive_manager import detect_or_register_drive, lookup_drive_id
 from scanner import Scanner
+from multi_scanner import MultiDriveScanner
+from hash_pass import FullHashPass, HashMigrationPass
+from metadata_pass import MetadataRefinePass
+from dedupe import DedupeEngine
+
+
+# --------------------------------------------------
+# Command Line
+# --------------------------------------------------
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=f"{APP_NAME} Phase 1 drive scanner")
+
+    parser.add_argument(
+        "--rescan-mode",
+        choices=RESCAN_MODES,
+        default=DEFAULT_RESCAN_MODE,
+        help="skip: reuse rows whose size and mtime are unchanged; "
+             "force: reprocess every file"
+    )
+
+    parser.add_argument(
+        "--compute-full-hash",
+        action="store_true",
+        default=DEFAULT_COMPUTE_FULL_HASH,
+        help="compute the full-file hash during the crawl "
+             "(default: partial hash only)"
+    )
+
+    parser.add_argument(
+        "--hash-algo",
+        choices=HASH_ALGORITHMS,
+        default=DEFAULT_HASH_ALGO,
+        help="algorithm for partial and full hashes (stored per file; "
+             f"default: {DEFAULT_HASH_ALGO}); with menu option 5, the "
+             "algorithm to convert existing rows to"
+    )
+
+    parser.add_argument(
+        "--flac-full-hash",
+        action="store_true",
+        default=DEFAULT_FLAC_FULL_HASH,
+        help="full-hash FLACs too (by default FLACs with a STREAMINFO MD5 "
+             "are matched on it and not read in full)"
+    )
+
+    parser.add_argument(
+        "--hash-workers",
+        type=int,
+        default=None,
+        help="number of hash worker threads "
+             "(default: chosen from the drive's device type)"
+    )
+
+    parser.add_argument(
+        "--metadata-processes",
+        type=int,
+        default=DEFAULT_METADATA_PROCESSES,
+        help="parse tags in this many worker processes "
+             "(default: 0, parse in the metadata stage thread)"
+    )
+
+    parser.add_argument(
+        "--deep-verify",
+        action="store_true",
+        default=DEFAULT_DEEP_VERIFY,
+        help="stat every file, even in directories whose mtime and entry "
+             "count are unchanged since the last scan"
+    )
+
+    parser.add_argument(
+        "--read-order",
+        choices=READ_ORDERS,
+        default=DEFAULT_READ_ORDER,
+        help="order in which files are read for hashing: off (walk order), "
+             "inode, or extent (first physical extent via FIEMAP, Linux); "
+             "reduces seeking on HDDs"
+    )
+
+    parser.add_argument(
+        "--read-window",
+        type=int,
+        default=READ_SCHEDULE_WINDOW,
+        help=f"files reordered together by --read-order (default: {READ_SCHEDULE_WINDOW})"
+    )
+
+    parser.add_argument(
+        "--no-fadvise",
+        dest="fadvise",
+        action="store_false",
+        default=DEFAULT_FADVISE,
+        help="do not send posix_fadvise page cache hints while hashing "
+             "(by default hashed data is dropped from the cache once read)"
+    )
+
+    parser.add_argument(
+        "--metadata-mode",
+        choices=METADATA_MODES,
+        default=DEFAULT_METADATA_MODE,
+        help="precise: let the tag parser read what it needs; fast: cap the "
+             "bytes read per file past the leading tags and estimate the duration when needed "
+             "(refine later with menu option 7)"
+    )
+
+    parser.add_argument(
+        "--no-metadata-cache",
+        dest="metadata_cache",
+        action="store_false",
+        default=DEFAULT_METADATA_CACHE,
+        help="parse the tags of every processed file again (by default "
+             "unchanged files and copies of known files reuse stored metadata)"
+    )
+
+    parser.add_argument(
+        "--drives",
+        nargs="+",
+        metavar="ROOT",
+        help="scan several drive roots at once (no menu); roots on "
+             "different physical devices are scanned in parallel and "
+             "interrupted runs are resumed"
+    )
+
+    parser.add_argument(
+        "--dedupe",
+        action="store_true",
+        help="find duplicates across all drives in the database (no menu); "
+             "files are read only from the --drives roots, which are "
+             "scanned first"
+    )
+
+    return parser.parse_args()
 
 
 # --------------------------------------------------
@@ -18,6 +157,10 @@ def show_menu():
     print("1. Test Mode (no hashing)")
     print("2. New Drive (force new key)")
     print("3. Resume / Update Existing Drive")
+    print("4. Full-Hash Partial Hash Collisions")
+    print("5. Convert Hashes to --hash-algo")
+    print("6. Find Duplicates (all drives)")
+    print("7. Refine Estimated Metadata")
     print("0. Exit")
 
 
@@ -41,6 +184,14 @@ def get_mode():
         return "new"
     elif choice == "3":
         return "resume"
+    elif choice == "4":
+        return "hash"
+    elif choice == "5":
+        return "migrate"
+    elif choice == "6":
+        return "dedupe"
+    elif choice == "7":
+        return "refine"
     elif choice == "0":
         sys.exit(0)
     else:
@@ -54,10 +205,21 @@ def get_mode():
 
 def main():
 
+    args = parse_args()
+
     setup_logging()
 
     logging.info("Application started.")
 
+    if args.drives:
+        run_multi_drive(args)
+
+    if args.dedupe:
+        run_dedupe(args)
+
+    if args.drives or args.dedupe:
+        return
+
     drive_root = get_drive_input()
     mode = get_mode()
 
@@ -82,15 +244,66 @@ def main():
     logging.info(f"Drive ID: {drive_id}")
     logging.info(f"Drive Key: {drive_key}")
 
-    scanner = Scanner(
-        db=db,
-        drive_id=drive_id,
-        drive_root=drive_root,
-        test_mode=test_mode,
-        extract_metadata=True
-    )
+    if mode == "hash":
+        FullHashPass(
+            db=db,
+            drive_id=drive_id,
+            drive_root=drive_root,
+            fadvise=args.fadvise,
+            flac_full_hash=args.flac_full_hash
+        ).run()
+    elif mode == "migrate":
+        HashMigrationPass(
+            db=db,
+            drive_id=drive_id,
+            drive_root=drive_root,
+            hash_algo=args.hash_algo,
+            fadvise=args.fadvise
+        ).run()
+    elif mode == "dedupe":
+        DedupeEngine(
+            db=db,
+            drive_roots={drive_id: drive_root},
+            hash_algo=args.hash_algo,
+            fadvise=args.fadvise,
+            flac_full_hash=args.flac_full_hash
+        ).run()
+    elif mode == "refine":
+        MetadataRefinePass(
+            db=db,
+            drive_id=drive_id,
+            drive_root=drive_root
+        ).run()
+    else:
+        scanner = Scanner(
+            db=db,
+            drive_id=drive_id,
+            drive_root=drive_root,
+            test_mode=test_mode,
+            extract_metadata=True,
+            rescan_mode=args.rescan_mode,
+            compute_full_hash=args.compute_full_hash,
+            hash_algo=args.hash_algo,
+            flac_full_hash=args.flac_full_hash,
+            metadata_cache=args.metadata_cache,
+            metadata_mode=args.metadata_mode,
+            hash_workers=args.hash_workers,
+            metadata_processes=args.metadata_processes,
+            deep_verify=args.deep_verify,
+            resume=mode == "resume",
+            read_order=args.read_order,
+            read_window=args.read_window,
+            fadvise=args.fadvise
+        )
 
-    scanner.run()
+        try:
+            scanner.run()
+        except KeyboardInterrupt:
+            db.close()
+            logging.warning("Scan stopped. Progress is checkpointed; choose "
+                            "'Resume' to continue from the last completed directory.")
+            print("\nScan interrupted. Run again and choose option 3 to resume.")
+            sys.exit(130)
 
     db.close()
 
@@ -99,6 +312,75 @@ def main():
     input("Press Enter to exit...")
 
 
+def run_multi_drive(args):
+
+    for drive_root in args.drives:
+        if not os.path.exists(drive_root):
+            print(f"Drive path does not exist: {drive_root}")
+            sys.exit(1)
+
+    db = Database(DB_PATH)
+
+    scanner = MultiDriveScanner(
+        db=db,
+        drive_roots=args.drives,
+        extract_metadata=True,
+        rescan_mode=args.rescan_mode,
+        compute_full_hash=args.compute_full_hash,
+        hash_algo=args.hash_algo,
+        flac_full_hash=args.flac_full_hash,
+        metadata_cache=args.metadata_cache,
+        metadata_mode=args.metadata_mode,
+        hash_workers=args.hash_workers,
+        metadata_processes=args.metadata_processes,
+        deep_verify=args.deep_verify,
+        resume=True,
+        read_order=args.read_order,
+        read_window=args.read_window,
+        fadvise=args.fadvise
+    )
+
+    try:
+        scanner.run()
+    except KeyboardInterrupt:
+        db.close()
+        logging.warning("Multi-drive scan stopped. Progress is checkpointed; "
+                        "run again with the same --drives to resume.")
+        sys.exit(130)
+
+    db.close()
+
+    logging.info("Application finished successfully.")
+
+
+def run_dedupe(args):
+
+    db = Database(DB_PATH)
+
+    drive_roots = {}
+
+    for drive_root in args.drives or ():
+        drive_id = lookup_drive_id(db, drive_root)
+
+        if drive_id is None:
+            logging.warning(f"{drive_root} is not a registered drive; not read for dedupe")
+            continue
+
+        drive_roots[drive_id] = drive_root
+
+    DedupeEngine(
+        db=db,
+        drive_roots=drive_roots,
+        hash_algo=args.hash_algo,
+        fadvise=args.fadvise,
+        flac_full_hash=args.flac_full_hash
+    ).run()
+
+    db.close()
+
+    logging.info("Application finished successfully.")
+
+
 # --------------------------------------------------
 
 if __name__ == "__main__":
@@ -0,0 +1,59 @@
+import logging
+import sqlite3
+
+from db import Database
+
+
+class MetadataCache:
+    """
+    Fills in the metadata of scanned files from rows already in the
+    database with the same content, so they do not go through mutagen.
+
+    Content is matched on (hash_algo, partial_hash, size, mtime): a
+    moved, renamed or copied file keeps all four, while a retag changes
+    the mtime. Files whose own row is unchanged never get here (see
+    Scanner, "metadata_cached"). Estimated metadata (fast mode) is only
+    reused with include_estimated.
+
+    Used as a stage in front of metadata extraction. Lookups go through
+    a read-only connection of their own, opened in the stage thread,
+    while the writer thread keeps committing.
+    """
+
+    def __init__(self, db_path: str, include_estimated=False):
+        self.db_path = db_path
+        self.include_estimated = include_estimated
+        self.reader = None
+
+    def resolve(self, jobs):
+        try:
+            for job in jobs:
+                if job.get("tag_regions") and job["partial_hash"] is not None:
+                    metadata = self._lookup(job)
+
+                    if metadata is not None:
+                        job["metadata"] = metadata
+                        job["metadata_cached"] = True
+                        job["tag_regions"] = None
+
+                yield job
+        finally:
+            self.close()
+
+    def _lookup(self, job):
+        if self.reader is None:
+            self.reader = Database(self.db_path, read_only=True)
+
+        try:
+            return self.reader.get_cached_metadata(
+                job["hash_algo"], job["partial_hash"],
+                job["size_bytes"], job["modified_fs"], self.include_estimated
+            )
+        except sqlite3.Error as e:
+            logging.error(f"Metadata cache lookup failed for {job['full_path']}: {e}")
+            return None
+
+    def close(self):
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
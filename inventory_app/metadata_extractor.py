@@ -1,11 +1,17 @@
 import logging
 from mutagen import File as MutagenFile
 
+from audio_payload import leading_tags_end, trailing_tags_start
 
-def extract_audio_metadata(file_path: str) -> dict | None:
+
+def extract_audio_metadata(file_path: str, fileobj=None) -> dict | None:
     """
     Extracts audio metadata using mutagen.
 
+    If fileobj is given, mutagen parses it instead of opening file_path
+    (used to share an already-open or in-memory file); file_path is then
+    only used for logging.
+
     Returns dictionary:
     {
         duration,
@@ -15,48 +21,164 @@ def extract_audio_metadata(file_path: str) -> dict | None:
         artist,
         album,
         title,
-        year
+        year,
+        estimated
     }
+
+    Fast mode: fileobj is a HeadTailFile with a read_limit. When parsing
+    would read past it, the codec info is estimated instead (see
+    estimate_audio_metadata) and "estimated" is True.
     """
 
     try:
-        audio = MutagenFile(file_path, easy=True)
-
-        if audio is None:
-            return None
-
-        metadata = {
-            "duration": None,
-            "bitrate": None,
-            "sample_rate": None,
-            "channels": None,
-            "artist": None,
-            "album": None,
-            "title": None,
-            "year": None
-        }
-
-        # Technical info
-        if hasattr(audio, "info") and audio.info:
-            metadata["duration"] = getattr(audio.info, "length", None)
-            metadata["bitrate"] = getattr(audio.info, "bitrate", None)
-            metadata["sample_rate"] = getattr(audio.info, "sample_rate", None)
-            metadata["channels"] = getattr(audio.info, "channels", None)
-
-        # Tags
-        if audio.tags:
-            metadata["artist"] = _safe_get(audio.tags, "artist")
-            metadata["album"] = _safe_get(audio.tags, "album")
-            metadata["title"] = _safe_get(audio.tags, "title")
-            metadata["year"] = _safe_get(audio.tags, "date") or _safe_get(audio.tags, "year")
-
-        return metadata
+        return read_audio_metadata(file_path, fileobj)
 
     except Exception as e:
         logging.error(f"Metadata extraction failed for {file_path}: {e}")
         return None
 
 
+def read_audio_metadata(file_path: str, fileobj=None) -> dict | None:
+    """
+    Same as extract_audio_metadata, but raises on failure instead of
+    logging. Used where the error has to be reported from another
+    process.
+    """
+
+    try:
+        audio = MutagenFile(fileobj if fileobj is not None else file_path, easy=True)
+    except Exception:
+        # mutagen may wrap the ReadLimitExceeded, hence the flag
+        if getattr(fileobj, "limit_exceeded", False):
+            return estimate_audio_metadata(fileobj)
+        raise
+
+    if audio is None:
+        return None
+
+    metadata = _empty_metadata()
+
+    # Parsed, but something past the limit was skipped on the way
+    metadata["estimated"] = getattr(fileobj, "limit_exceeded", False)
+
+    # Technical info
+    if hasattr(audio, "info") and audio.info:
+        metadata["duration"] = getattr(audio.info, "length", None)
+        metadata["bitrate"] = getattr(audio.info, "bitrate", None)
+        metadata["sample_rate"] = getattr(audio.info, "sample_rate", None)
+        metadata["channels"] = getattr(audio.info, "channels", None)
+
+    # Tags
+    if audio.tags:
+        metadata["artist"] = _safe_get(audio.tags, "artist")
+        metadata["album"] = _safe_get(audio.tags, "album")
+        metadata["title"] = _safe_get(audio.tags, "title")
+        metadata["year"] = _safe_get(audio.tags, "date") or _safe_get(audio.tags, "year")
+
+    return metadata
+
+
+def estimate_audio_metadata(tag_file) -> dict:
+    """
+    Codec info of a file from a HeadTailFile, reading at most a few
+    bytes past its cached regions, for fast mode:
+    - FLAC : sample rate, channels and duration from STREAMINFO
+    - MPEG : bitrate, sample rate and channels from the first frame
+             header; duration = audio bytes / bitrate (exact for CBR
+             only)
+    Tags are left out. The result is flagged estimated.
+    """
+
+    metadata = _empty_metadata()
+    metadata["estimated"] = True
+
+    try:
+        start = leading_tags_end(tag_file.read_at, tag_file.size)
+        header = tag_file.read_at(start, 42)
+    except OSError:
+        return metadata
+
+    if header[:4] == b"fLaC":
+        _flac_stream_info(header, tag_file.size, metadata)
+    else:
+        end = trailing_tags_start(tag_file.tail, tag_file.size) or tag_file.size
+        _mpeg_frame_info(header, end - start, metadata)
+
+    return metadata
+
+
+def _flac_stream_info(header: bytes, size: int, metadata: dict):
+    # fLaC, block header, then min/max block size (4), min/max frame
+    # size (6) and 8 bytes: sample rate (20 bits), channels - 1 (3),
+    # bits per sample - 1 (5), total samples (36)
+    if len(header) < 26:
+        return
+
+    packed = int.from_bytes(header[18:26], "big")
+    sample_rate = packed >> 44
+    total_samples = packed & ((1 << 36) - 1)
+
+    metadata["sample_rate"] = sample_rate or None
+    metadata["channels"] = ((packed >> 41) & 0x7) + 1
+
+    if sample_rate and total_samples:
+        metadata["duration"] = total_samples / sample_rate
+        metadata["bitrate"] = int(size * 8 / metadata["duration"])
+
+
+# Bitrates in kbit/s by (MPEG-1, layer) and (MPEG-2 / 2.5, layer)
+_MPEG_BITRATES = {
+    (True, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+
+# Sample rates by version bits (0 = MPEG-2.5, 2 = MPEG-2, 3 = MPEG-1)
+_MPEG_SAMPLE_RATES = {
+    0: (11025, 12000, 8000),
+    2: (22050, 24000, 16000),
+    3: (44100, 48000, 32000),
+}
+
+
+def _mpeg_frame_info(header: bytes, audio_bytes: int, metadata: dict):
+    if len(header) < 4 or header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return
+
+    version = (header[1] >> 3) & 0x3
+    layer = 4 - ((header[1] >> 1) & 0x3)
+    bitrate_index = header[2] >> 4
+    sample_rate_index = (header[2] >> 2) & 0x3
+
+    if version not in _MPEG_SAMPLE_RATES or layer == 4 or \
+            bitrate_index in (0, 15) or sample_rate_index == 3:
+        return
+
+    bitrate = _MPEG_BITRATES[(version == 3, layer)][bitrate_index] * 1000
+
+    metadata["bitrate"] = bitrate
+    metadata["sample_rate"] = _MPEG_SAMPLE_RATES[version][sample_rate_index]
+    metadata["channels"] = 1 if header[3] >> 6 == 3 else 2
+    metadata["duration"] = audio_bytes * 8 / bitrate
+
+
+def _empty_metadata() -> dict:
+    return {
+        "duration": None,
+        "bitrate": None,
+        "sample_rate": None,
+        "channels": None,
+        "artist": None,
+        "album": None,
+        "title": None,
+        "year": None,
+        "estimated": False
+    }
+
+
 def _safe_get(tags, key):
     try:
         value = tags.get(key)
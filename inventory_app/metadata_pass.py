@@ -0,0 +1,33 @@
+import logging
+
+from file_pass import FilePass
+from metadata_extractor import extract_audio_metadata
+
+
+class MetadataRefinePass(FilePass):
+    """
+    Re-reads the metadata of files on one drive that a fast-mode scan
+    stored as estimated, this time letting mutagen read whatever it
+    needs, and replaces the estimated rows. Refined rows are no longer
+    selected.
+    """
+
+    pass_name = "Metadata refine pass"
+
+    def candidates(self) -> list:
+        return self.db.get_estimated_metadata_files(self.drive_id)
+
+    def process(self, file_id, full_path, size_bytes):
+        metadata = extract_audio_metadata(full_path)
+        return (file_id, metadata) if metadata is not None else None
+
+    def commit(self, rows: list):
+        self.db.write_audio_metadata_batch(rows)
+
+    def _print_summary(self):
+
+        logging.info("===== METADATA REFINE SUMMARY =====")
+        logging.info(f"Files refined       : {self.processed_files}")
+        logging.info(f"Changed since scan  : {self.changed_files}")
+        logging.info(f"Files failed        : {self.failed_files}")
+        logging.info("===================================")
@@ -0,0 +1,124 @@
+import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from config import METADATA_BATCH_SIZE
+from file_reader import HeadTailFile
+from metadata_extractor import read_audio_metadata
+
+
+# --------------------------------------------------
+# Worker Process Entry
+# --------------------------------------------------
+
+def extract_metadata_batch(items: list, read_limit=None) -> list:
+    """
+    Runs in a worker process.
+
+    items: list of (full_path, size_bytes, head, tail)
+    Returns one (metadata, error) tuple per item. Tags are parsed from
+    the head/tail bytes already read by the hash stage; the file is only
+    reopened if mutagen needs a region outside them, for at most
+    read_limit bytes (fast mode).
+    """
+
+    results = []
+
+    for full_path, size_bytes, head, tail in items:
+        tag_file = HeadTailFile(full_path, size_bytes, head, tail, read_limit=read_limit)
+
+        try:
+            results.append((read_audio_metadata(full_path, tag_file), None))
+        except Exception as e:
+            results.append((None, str(e)))
+        finally:
+            tag_file.close()
+
+    return results
+
+
+# --------------------------------------------------
+# Process Pool
+# --------------------------------------------------
+
+class MetadataPool:
+    """
+    Process pool for mutagen parsing, which is pure Python and holds the
+    GIL. Jobs are sent in batches of batch_size to amortize IPC and come
+    back in input order. A failure is logged per file and the scan
+    continues, as with in-thread extraction.
+
+    Jobs needing extraction carry "tag_regions" = (head, tail); the
+    regions are dropped once the metadata is filled in.
+    """
+
+    def __init__(self, processes: int, batch_size=METADATA_BATCH_SIZE, read_limit=None):
+        self.processes = processes
+        self.batch_size = batch_size
+        self.read_limit = read_limit
+        self.max_pending = processes * 2
+        self.executor = ProcessPoolExecutor(max_workers=processes)
+
+    def map(self, jobs):
+        pending = deque()
+        batch = []
+
+        for job in jobs:
+            batch.append(job)
+
+            if len(batch) >= self.batch_size:
+                pending.append(self._submit(batch))
+                batch = []
+
+            while len(pending) > self.max_pending:
+                yield from self._collect(*pending.popleft())
+
+        if batch:
+            pending.append(self._submit(batch))
+
+        while pending:
+            yield from self._collect(*pending.popleft())
+
+    def _submit(self, batch):
+        items = [
+            (job["full_path"], job["size_bytes"], *job["tag_regions"])
+            for job in batch if job.get("tag_regions")
+        ]
+
+        future = self.executor.submit(extract_metadata_batch, items, self.read_limit) if items else None
+        return batch, future
+
+    def _collect(self, batch, future):
+        results = []
+
+        if future is not None:
+            try:
+                results = future.result()
+            except Exception as e:
+                logging.error(f"Metadata worker batch failed: {e}")
+
+        results = iter(results)
+
+        for job in batch:
+            if not job.get("tag_regions"):
+                yield job
+                continue
+
+            job["tag_regions"] = None
+            metadata, error = next(results, (None, "worker batch failed"))
+
+            if error:
+                logging.error(f"Metadata extraction failed for {job['full_path']}: {error}")
+
+            job["metadata"] = metadata
+            yield job
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -0,0 +1,176 @@
+import time
+import logging
+import threading
+
+from db_writer import DatabaseThread, SerializedDatabase
+from device_info import group_roots_by_device
+from drive_manager import detect_or_register_drive
+from pipeline import PipelineStopped
+from scanner import Scanner
+from utils import human_readable_size, sigterm_as_interrupt
+
+
+class MultiDriveScanner:
+    """
+    Scans several drive roots at once, one worker group (a thread running
+    Scanners) per physical device.
+
+    Roots on the same device (e.g. two partitions of one disk) run in
+    sequence, so a spindle never serves two crawlers/readers at once;
+    devices run in parallel. Every scanner talks to the database through
+    one DatabaseThread, which keeps batch transactions from interleaving.
+
+    scanner_options are passed to every Scanner (rescan_mode,
+    compute_full_hash, hash_workers, ...).
+    """
+
+    def __init__(self, db, drive_roots, force_new=False, **scanner_options):
+        self.db = db
+        self.drive_roots = list(drive_roots)
+        self.force_new = force_new
+        self.scanner_options = scanner_options
+
+        self.groups = {}
+        self.scanners = []
+        self.failures = []
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+
+        self.db_thread = None
+        self.elapsed = 0.0
+
+    # --------------------------------------------------
+    # Main Entry
+    # --------------------------------------------------
+
+    def run(self):
+
+        drives = {}
+
+        for drive_root in self.drive_roots:
+            drive_id, drive_key = detect_or_register_drive(
+                db=self.db,
+                drive_root=drive_root,
+                force_new=self.force_new
+            )
+            logging.info(f"Drive {drive_root}: ID {drive_id}, key {drive_key}")
+            drives[drive_root] = drive_id
+
+        self.groups = group_roots_by_device(self.drive_roots)
+
+        for device, roots in self.groups.items():
+            logging.info(f"Device {device}: {', '.join(roots)}")
+
+        started = time.monotonic()
+
+        with DatabaseThread(self.db) as db_thread:
+            self.db_thread = db_thread
+            shared_db = SerializedDatabase(db_thread)
+
+            done_events = []
+
+            for device, roots in self.groups.items():
+                done = threading.Event()
+                done_events.append(done)
+
+                threading.Thread(
+                    target=self._scan_group,
+                    args=(shared_db, [(root, drives[root]) for root in roots], done),
+                    name=f"device-{device}",
+                    daemon=True
+                ).start()
+
+            try:
+                # Event waits rather than Thread.join(), which a
+                # KeyboardInterrupt can leave in a broken state. Scanners
+                # run off the main thread, so SIGTERM is turned into
+                # KeyboardInterrupt here rather than in Scanner.run
+                with sigterm_as_interrupt():
+                    for done in done_events:
+                        while not done.wait(timeout=0.5):
+                            pass
+
+            except BaseException:
+                # Ctrl-C / SIGTERM: stop every group at its checkpoint
+                self.stop()
+                for done in done_events:
+                    done.wait()
+                raise
+
+            finally:
+                self.elapsed = time.monotonic() - started
+
+        self._print_summary()
+
+    def stop(self):
+        self.stop_event.set()
+
+        with self.lock:
+            for scanner in self.scanners:
+                scanner.stop()
+
+    # --------------------------------------------------
+    # Device Group (one thread per device)
+    # --------------------------------------------------
+
+    def _scan_group(self, shared_db, drives, done):
+        try:
+            self._scan_drives(shared_db, drives)
+        finally:
+            done.set()
+
+    def _scan_drives(self, shared_db, drives):
+
+        for drive_root, drive_id in drives:
+
+            if self.stop_event.is_set():
+                return
+
+            scanner = Scanner(
+                db=shared_db,
+                drive_id=drive_id,
+                drive_root=drive_root,
+                **self.scanner_options
+            )
+
+            with self.lock:
+                self.scanners.append(scanner)
+
+            # Covers a stop() that ran before this scanner was registered
+            if self.stop_event.is_set():
+                scanner.stop()
+
+            try:
+                scanner.run()
+            except PipelineStopped:
+                logging.warning(f"Scan of {drive_root} stopped at its last checkpoint")
+                return
+            except Exception as e:
+                logging.error(f"Scan of {drive_root} failed: {e}")
+                with self.lock:
+                    self.failures.append((drive_root, e))
+
+    # --------------------------------------------------
+    # Summary
+    # --------------------------------------------------
+
+    def _print_summary(self):
+
+        total_files = sum(scanner.total_files for scanner in self.scanners)
+        total_bytes = sum(scanner.total_bytes for scanner in self.scanners)
+        read_bytes = sum(scanner.bytes_read() for scanner in self.scanners)
+        elapsed = max(self.elapsed, 1e-9)
+
+        logging.info("======= MULTI-DRIVE SUMMARY ======")
+        logging.info(f"Drives scanned      : {len(self.drive_roots)}")
+        logging.info(f"Devices             : {len(self.groups)}")
+        logging.info(f"Failed drives       : {len(self.failures)}")
+        logging.info(f"Total files scanned : {total_files}")
+        logging.info(f"Total size scanned  : {human_readable_size(total_bytes)}")
+        logging.info(f"Elapsed             : {elapsed:.1f}s")
+        logging.info(f"Files per second    : {total_files / elapsed:.1f}")
+        logging.info(f"Read throughput     : {human_readable_size(read_bytes / elapsed)}/s")
+        logging.info(f"DB thread calls     : {self.db_thread.calls} "
+                     f"(busy {self.db_thread.busy_seconds:.1f}s, "
+                     f"{100 * self.db_thread.busy_seconds / elapsed:.0f}%)")
+        logging.info("==================================")
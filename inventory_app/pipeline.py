@@ -0,0 +1,228 @@
+import time
+import queue
+import logging
+import threading
+
+from config import STAGE_QUEUE_SIZE, STAGE_REPORT_SECONDS
+from utils import human_readable_size
+
+
+_DONE = object()
+
+
+class _Aborted(Exception):
+    pass
+
+
+class PipelineStopped(Exception):
+    """
+    Raised by Pipeline.run when the pipeline was stopped from outside
+    (Pipeline.stop) before all items went through.
+    """
+
+
+# --------------------------------------------------
+# Stage
+# --------------------------------------------------
+
+class Stage(threading.Thread):
+    """
+    One pipeline stage running on its own thread.
+
+    transform is a generator function taking an iterator of input items
+    and yielding output items. Items flow between stages through bounded
+    queues, so a slow stage applies backpressure instead of letting
+    memory grow.
+
+    Stats:
+    - items / bytes : output produced (bytes via the optional measure)
+    - wait_in       : time blocked waiting for input (stage starved)
+    - wait_out      : time blocked on a full output queue (downstream slow)
+    A stage with little of either is the bottleneck.
+    """
+
+    def __init__(self, name, transform, input_queue, output_queue,
+                 abort_event, measure=None):
+        super().__init__(name=f"stage-{name}", daemon=True)
+        self.stage_name = name
+        self.transform = transform
+        self.input_queue = input_queue
+        self.output_queue = output_queue
+        self.abort_event = abort_event
+        self.measure = measure
+
+        self.items = 0
+        self.bytes = 0
+        self.wait_in = 0.0
+        self.wait_out = 0.0
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+
+        # Waited on instead of join(): a KeyboardInterrupt raised inside
+        # Thread.join() can leave the thread looking finished while it
+        # still runs
+        self.done = threading.Event()
+
+    def run(self):
+        self.started_at = time.monotonic()
+        finished = False
+
+        try:
+            for item in self.transform(self._input()):
+                self.items += 1
+                if self.measure:
+                    self.bytes += self.measure(item)
+                if self.output_queue is not None:
+                    self._put(item)
+
+            finished = True
+
+        except _Aborted:
+            pass
+
+        except BaseException as e:
+            self.error = e
+            self.abort_event.set()
+            logging.error(f"Pipeline stage '{self.stage_name}' failed: {e}")
+
+        finally:
+            self.finished_at = time.monotonic()
+            if finished and self.output_queue is not None:
+                try:
+                    self._put(_DONE)
+                except _Aborted:
+                    pass
+            self.done.set()
+
+    def _input(self):
+        if self.input_queue is None:
+            return
+
+        while True:
+            started = time.monotonic()
+
+            while True:
+                if self.abort_event.is_set():
+                    raise _Aborted()
+                try:
+                    item = self.input_queue.get(timeout=0.5)
+                    break
+                except queue.Empty:
+                    continue
+
+            self.wait_in += time.monotonic() - started
+
+            if item is _DONE:
+                return
+
+            yield item
+
+    def _put(self, item):
+        started = time.monotonic()
+
+        while True:
+            if self.abort_event.is_set():
+                raise _Aborted()
+            try:
+                self.output_queue.put(item, timeout=0.5)
+                break
+            except queue.Full:
+                continue
+
+        self.wait_out += time.monotonic() - started
+
+    # --------------------------------------------------
+    # Stats
+    # --------------------------------------------------
+
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        end = self.finished_at or time.monotonic()
+        return max(end - self.started_at, 1e-9)
+
+    def stats_line(self) -> str:
+        elapsed = self.elapsed()
+        line = f"{self.stage_name:<9} items={self.items} ({self.items / elapsed:.1f}/s)"
+
+        if self.measure:
+            line += f" read={human_readable_size(self.bytes)} ({human_readable_size(self.bytes / elapsed)}/s)"
+
+        line += f" wait_in={self.wait_in:.1f}s wait_out={self.wait_out:.1f}s"
+
+        if self.output_queue is not None:
+            line += f" queue={self.output_queue.qsize()}/{self.output_queue.maxsize}"
+
+        return line
+
+
+# --------------------------------------------------
+# Pipeline
+# --------------------------------------------------
+
+class Pipeline:
+    """
+    Chain of stages connected by bounded queues.
+
+    stages: list of (name, transform) or (name, transform, measure).
+    The first stage is the source (its transform gets an empty
+    iterator); output of the last stage is discarded.
+    """
+
+    def __init__(self, stages, queue_size=STAGE_QUEUE_SIZE,
+                 report_interval=STAGE_REPORT_SECONDS):
+        self.abort_event = threading.Event()
+        self.stopped = False
+        self.report_interval = report_interval
+        self.stages = []
+
+        input_queue = None
+
+        for index, spec in enumerate(stages):
+            name, transform = spec[0], spec[1]
+            measure = spec[2] if len(spec) > 2 else None
+
+            is_last = index == len(stages) - 1
+            output_queue = None if is_last else queue.Queue(maxsize=queue_size)
+
+            self.stages.append(Stage(name, transform, input_queue, output_queue,
+                                     self.abort_event, measure))
+            input_queue = output_queue
+
+    def run(self):
+        for stage in self.stages:
+            stage.start()
+
+        try:
+            last = self.stages[-1]
+
+            while not last.done.wait(timeout=self.report_interval):
+                self.log_stats()
+
+        except BaseException:
+            self.abort_event.set()
+            raise
+
+        finally:
+            for stage in self.stages:
+                stage.done.wait()
+
+        for stage in self.stages:
+            if stage.error is not None:
+                raise stage.error
+
+        if self.stopped:
+            raise PipelineStopped("pipeline stopped before completion")
+
+    def stop(self):
+        """
+        Asks every stage to stop; safe to call from any thread.
+        """
+
+        self.stopped = True
+        self.abort_event.set()
+
+    def log_stats(self):
+        for stage in self.stages:
+            logging.info(f"[stage] {stage.stats_line()}")
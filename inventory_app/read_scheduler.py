@@ -0,0 +1,146 @@
+import os
+import errno
+import struct
+import logging
+
+from config import READ_SCHEDULE_WINDOW
+from audio_detector import is_extension_allowed
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+# FS_IOC_FIEMAP = _IOWR('f', 11, struct fiemap)
+_FS_IOC_FIEMAP = 0xC020660B
+
+# struct fiemap header (fm_start, fm_length, fm_flags, fm_mapped_extents,
+# fm_extent_count, fm_reserved) followed by one struct fiemap_extent
+_FIEMAP_HEADER = struct.Struct("=QQIIII")
+_FIEMAP_EXTENT = struct.Struct("=QQQQQIIII")
+_FIEMAP_FLAG_SYNC = 0x1
+
+# ioctl errors meaning the filesystem (not the file) has no FIEMAP
+_FIEMAP_UNSUPPORTED = (errno.ENOTTY, errno.EOPNOTSUPP)
+
+
+# --------------------------------------------------
+# Physical Location
+# --------------------------------------------------
+
+def first_extent_offset(full_path: str) -> int | None:
+    """
+    Physical byte offset of the first extent of a file via the Linux
+    FIEMAP ioctl, or None when the file has no mapped extent (empty,
+    inline data, delayed allocation).
+
+    Raises OSError when the file cannot be mapped; errno ENOTTY or
+    EOPNOTSUPP when the platform or filesystem has no FIEMAP.
+    """
+
+    if fcntl is None:
+        raise OSError(errno.EOPNOTSUPP, "FIEMAP is not available on this platform")
+
+    request = bytearray(_FIEMAP_HEADER.size + _FIEMAP_EXTENT.size)
+    _FIEMAP_HEADER.pack_into(request, 0, 0, 0xFFFFFFFFFFFFFFFF, _FIEMAP_FLAG_SYNC, 0, 1, 0)
+
+    fd = os.open(full_path, os.O_RDONLY)
+    try:
+        fcntl.ioctl(fd, _FS_IOC_FIEMAP, request)
+    finally:
+        os.close(fd)
+
+    mapped_extents = _FIEMAP_HEADER.unpack_from(request, 0)[3]
+
+    if not mapped_extents:
+        return None
+
+    return _FIEMAP_EXTENT.unpack_from(request, _FIEMAP_HEADER.size)[1]
+
+
+# --------------------------------------------------
+# Scheduler Stage
+# --------------------------------------------------
+
+class ReadScheduler:
+    """
+    Reorders scan jobs so the hash/metadata stages read files in
+    on-disk order instead of directory order, cutting seeks on HDDs.
+
+    Jobs are collected in windows of `window` files to read. Within a
+    window, jobs are sorted by:
+    - "inode"  : inode number (on most filesystems close to allocation
+                 order)
+    - "extent" : physical offset of the first extent (FIEMAP). Files
+                 without a mapped extent follow in inode order. If the
+                 filesystem does not support FIEMAP the scheduler falls
+                 back to inode order for the rest of the scan
+
+    Jobs the hash stage does not read (skips, other extensions, empty
+    files) go first, and directory markers are held back until the end
+    of the window. A directory marker therefore still follows every file
+    of its directory.
+    """
+
+    def __init__(self, mode="inode", window=READ_SCHEDULE_WINDOW):
+        self.mode = mode
+        self.window = window
+
+        self.windows = 0
+
+    def order(self, jobs):
+        pending_reads = []
+        passthrough = []
+        markers = []
+
+        for job in jobs:
+            if "directory" in job:
+                markers.append(job)
+            elif not self._will_read(job):
+                passthrough.append(job)
+            else:
+                pending_reads.append(job)
+
+            if len(pending_reads) >= self.window:
+                yield from self._flush(pending_reads, passthrough, markers)
+                pending_reads, passthrough, markers = [], [], []
+
+        yield from self._flush(pending_reads, passthrough, markers)
+
+    def _flush(self, pending_reads, passthrough, markers):
+        if pending_reads:
+            self.windows += 1
+            pending_reads.sort(key=self._sort_key)
+
+        yield from passthrough
+        yield from pending_reads
+        yield from markers
+
+    @staticmethod
+    def _will_read(job) -> bool:
+        return not job["skip"] and job["size_bytes"] > 0 and is_extension_allowed(job["file_name"])
+
+    def _sort_key(self, job):
+        """
+        (0, physical offset) for files with a mapped extent, (1, inode)
+        otherwise, so the two kinds of position are never compared.
+        """
+
+        if self.mode == "extent":
+            try:
+                offset = first_extent_offset(job["full_path"])
+
+                if offset is not None:
+                    return 0, offset
+
+            except OSError as e:
+                if e.errno in _FIEMAP_UNSUPPORTED:
+                    logging.info(f"FIEMAP unavailable for {job['full_path']} ({e}); "
+                                 f"read scheduler falls back to inode order")
+                    self.mode = "inode"
+
+        return 1, job["inode"]
+
+    def describe(self) -> str:
+        return f"{self.mode} (window {self.window}, {self.windows} windows sorted)"
@@ -1,112 +1,605 @@
 import os
 import logging
+from contextlib import nullcontext
 from datetime import datetime
 
-from audio_detector import is_valid_audio
+from config import (
+    DEFAULT_RESCAN_MODE, DEFAULT_COMPUTE_FULL_HASH, DEFAULT_METADATA_PROCESSES,
+    DEFAULT_DEEP_VERIFY, DEFAULT_READ_ORDER, READ_SCHEDULE_WINDOW,
+    DEFAULT_FADVISE, DEFAULT_HASH_ALGO, DEFAULT_FLAC_FULL_HASH,
+    DEFAULT_METADATA_CACHE, DEFAULT_METADATA_MODE, FAST_TAG_READ_LIMIT,
+    PARTIAL_HASH_SIZE
+)
+from audio_detector import is_extension_allowed
 from metadata_extractor import extract_audio_metadata
-from hasher import compute_sha256
-from utils import human_readable_size
+from file_reader import FileContext, HeadTailFile
+from audio_payload import flac_streaminfo_md5
+from chunk_reader import ChunkReader, AdaptiveChunkSizer
+from crawler import walk_files, DirRecord
+from db_writer import BatchWriter
+from hash_pool import OrderedWorkPool
+from metadata_pool import MetadataPool
+from metadata_cache import MetadataCache
+from pipeline import Pipeline
+from read_scheduler import ReadScheduler
+from device_info import default_hash_workers
+from utils import human_readable_size, sigterm_as_interrupt
 
 
 class Scanner:
+    """
+    Scans one drive as a staged pipeline:
+
+        walk -> classify [-> schedule] -> hash -> metadata -> write
+
+    Each stage runs on its own thread, connected by bounded queues.
+    Only the write stage writes to the database while the pipeline runs.
+
+    read_order "inode" / "extent" adds the schedule stage (see
+    ReadScheduler).
+    """
 
     def __init__(self, db, drive_id, drive_root,
                  test_mode=False,
-                 extract_metadata=True):
+                 extract_metadata=True,
+                 rescan_mode=DEFAULT_RESCAN_MODE,
+                 compute_full_hash=DEFAULT_COMPUTE_FULL_HASH,
+                 hash_workers=None,
+                 metadata_processes=DEFAULT_METADATA_PROCESSES,
+                 deep_verify=DEFAULT_DEEP_VERIFY,
+                 resume=False,
+                 read_order=DEFAULT_READ_ORDER,
+                 read_window=READ_SCHEDULE_WINDOW,
+                 fadvise=DEFAULT_FADVISE,
+                 hash_algo=DEFAULT_HASH_ALGO,
+                 flac_full_hash=DEFAULT_FLAC_FULL_HASH,
+                 metadata_cache=DEFAULT_METADATA_CACHE,
+                 metadata_mode=DEFAULT_METADATA_MODE):
         self.db = db
         self.drive_id = drive_id
         self.drive_root = drive_root
         self.test_mode = test_mode
         self.extract_metadata = extract_metadata
-
+        self.rescan_mode = rescan_mode
+        self.compute_full_hash = compute_full_hash
+        self.hash_algo = hash_algo
+        self.flac_full_hash = flac_full_hash
+        self.hash_workers = hash_workers or default_hash_workers(drive_root)
+        self.metadata_processes = metadata_processes if extract_metadata else 0
+        self.metadata_cache = metadata_cache and extract_metadata
+        self.metadata_mode = metadata_mode
+        self.tag_read_limit = FAST_TAG_READ_LIMIT if metadata_mode == "fast" else None
+        self.deep_verify = deep_verify
+        self.resume = resume
+        self.reader = ChunkReader(AdaptiveChunkSizer.for_path(drive_root), fadvise)
+        self.read_scheduler = ReadScheduler(read_order, read_window) if read_order != "off" else None
+
+        self.known_files = {}
+        self.known_dirs = {}
+        self.known_dir_files = {}
+        self.incomplete_dirs = set()
+        self.scan_id = None
+        self.resume_after = None
+        self.checkpoint_dir = None
+        self.checkpoint_counters = {}
+        self.writer = None
+        self.pipeline = None
+        self.stopped = False
+
+        # Updated by the write stage, so a checkpoint only counts
+        # committed work (see _CHECKPOINT_COUNTERS)
         self.total_files = 0
+        self.new_files = 0
+        self.skipped_files = 0
+        self.reprocessed_files = 0
+        self.pruned_dirs = 0
+        self.unlisted_dirs = 0
+        self.served_files = 0
         self.audio_files = 0
+        self.flac_md5_files = 0
+        self.metadata_lookups = 0
+        self.metadata_cache_hits = 0
+        self.estimated_metadata = 0
         self.total_bytes = 0
 
+        self.missing_files = 0
+
     # --------------------------------------------------
     # Main Entry
     # --------------------------------------------------
 
     def run(self):
+        """
+        Scans the drive as one scan run. Every batch commit saves a
+        checkpoint: the last directory (in walk order) whose files are
+        all written, plus the counters. With resume=True an interrupted
+        run is continued after it under the same scan_id. SIGINT and
+        SIGTERM stop the pipeline, flush the pending batch and leave the
+        run 'interrupted'.
+
+        Files not seen are marked missing only when every directory
+        could be listed; otherwise the run ends 'incomplete'.
+        """
+
+        if self.resume:
+            self._load_resume_point()
+
+        self.known_files = self.db.get_known_files(self.drive_id)
+        logging.info(f"Loaded {len(self.known_files)} known files "
+                     f"(rescan mode: {self.rescan_mode})")
+
+        prune = None
+
+        if self.rescan_mode == "skip" and not self.deep_verify:
+            self._load_known_dirs()
+            prune = self._can_prune
+
+        self._start_scan_run()
+
+        logging.info(f"Hashing with {self.hash_workers} worker(s), "
+                     f"{self.metadata_processes} metadata process(es)")
+
+        self.writer = BatchWriter(self.db, self.scan_id, checkpoint=self._checkpoint)
+
+        metadata_pool = MetadataPool(
+            self.metadata_processes, read_limit=self.tag_read_limit
+        ) if self.metadata_processes else None
+        extract = metadata_pool.map if metadata_pool else self._metadata_stage
+        cache = MetadataCache(
+            self.db.db_path, include_estimated=self.metadata_mode == "fast"
+        ) if self.metadata_cache else None
+
+        with OrderedWorkPool(self.hash_workers) as hash_pool, \
+                (metadata_pool or nullcontext()):
+
+            stages = [
+                ("walk", lambda _: walk_files(self.drive_root, prune, self.resume_after)),
+                ("classify", self._classify_stage),
+                ("hash", lambda jobs: hash_pool.map(self._read_file, jobs),
+                 lambda job: job.get("bytes_read", 0)),
+                ("metadata", lambda jobs: extract(cache.resolve(jobs) if cache else jobs)),
+                ("write", self._write_stage),
+            ]
+
+            if self.read_scheduler:
+                stages.insert(2, ("schedule", self.read_scheduler.order))
+
+            self.pipeline = Pipeline(stages)
+
+            if self.stopped:
+                self.pipeline.stop()
+
+            try:
+                with sigterm_as_interrupt():
+                    self.pipeline.run()
+            except BaseException:
+                # Files not reached keep their previous state
+                self.db.finish_scan_run(self.scan_id, "interrupted")
+                logging.warning(f"Scan run {self.scan_id} interrupted; checkpoint at "
+                                f"directory '{self.checkpoint_dir or '(none)'}' "
+                                f"after {self.checkpoint_counters.get('total_files', 0)} files")
+                raise
+
+        if self.unlisted_dirs:
+            # The files under those directories were not seen but may
+            # well be there (I/O error, drive unplugged)
+            logging.warning(f"Scan run {self.scan_id} incomplete: {self.unlisted_dirs} "
+                            f"director(ies) could not be listed; no files marked missing")
+            self.db.finish_scan_run(self.scan_id, "incomplete")
+        else:
+            logging.info("Scan completed. Marking files not seen in this run as missing.")
+            self.missing_files = self.db.finalize_missing_files(self.drive_id, self.scan_id)
+            self.db.finish_scan_run(self.scan_id, "completed", self.missing_files)
 
-        logging.info("Marking all previous files as missing (pre-scan stage)")
-        self.db.mark_all_files_missing(self.drive_id)
+        self._print_summary()
+
+    def stop(self):
+        """
+        Stops a running scan from another thread. run() then raises
+        PipelineStopped and the run is left 'interrupted' at its last
+        checkpoint.
+        """
+
+        self.stopped = True
+        if self.pipeline is not None:
+            self.pipeline.stop()
 
-        for root, dirs, files in os.walk(self.drive_root):
+    def bytes_read(self) -> int:
+        if self.pipeline is None:
+            return 0
+        return sum(stage.bytes for stage in self.pipeline.stages)
 
-            for file_name in files:
+    def read_throughput(self) -> float:
+        """
+        Bytes per second read by the hash stage over its lifetime.
+        """
 
-                full_path = os.path.join(root, file_name)
+        if self.pipeline is None:
+            return 0.0
+        return sum(stage.bytes / stage.elapsed() for stage in self.pipeline.stages if stage.measure)
 
-                if not os.path.isfile(full_path):
-                    continue
+    # --------------------------------------------------
+    # Scan Runs / Checkpoints
+    # --------------------------------------------------
 
-                self.total_files += 1
+    def _load_resume_point(self):
+        run = self.db.get_resumable_scan_run(self.drive_id)
 
-                try:
-                    self._process_file(full_path, file_name)
+        if run is None:
+            logging.info("No interrupted scan run to resume; starting a new run")
+            return
 
-                except Exception as e:
-                    logging.error(f"File processing failed: {full_path} | {e}")
+        self.scan_id, self.rescan_mode, self.resume_after, counters = run
 
-        logging.info("Scan completed. Finalizing active files.")
-        self.db.finalize_missing_files(self.drive_id)
+        for name in _CHECKPOINT_COUNTERS:
+            setattr(self, name, counters.get(name, 0))
 
-        self._print_summary()
+        self.checkpoint_dir = self.resume_after
+        self.checkpoint_counters = counters
+
+    def _start_scan_run(self):
+        if self.scan_id is None:
+            self.scan_id = self.db.start_scan_run(self.drive_id, self.rescan_mode)
+            logging.info(f"Scan run {self.scan_id} started")
+            return
+
+        self.db.resume_scan_run(self.scan_id)
+        logging.info(f"Scan run {self.scan_id} resumed after directory "
+                     f"'{self.resume_after or '(none)'}' ({self.total_files} files done)")
+
+    def _checkpoint(self):
+        """
+        Called by the writer at each flush (write stage thread).
+
+        The counters are the ones taken at the checkpoint directory;
+        files flushed past it are walked and counted again on resume.
+        """
+
+        return self.checkpoint_dir, self.checkpoint_counters
 
     # --------------------------------------------------
-    # File Processing
+    # Directory Pruning
     # --------------------------------------------------
 
-    def _process_file(self, full_path, file_name):
+    def _load_known_dirs(self):
+        self.known_dirs = self.db.get_known_directories(self.drive_id)
 
-        relative_path = os.path.relpath(full_path, self.drive_root)
-        relative_path = relative_path.replace("\\", "/")
+        for relative_path, known in self.known_files.items():
+            self.known_dir_files.setdefault(_parent_dir(relative_path), []).append(known)
 
-        stat = os.stat(full_path)
+        logging.info(f"Loaded {len(self.known_dirs)} known directories")
 
-        size_bytes = stat.st_size
-        created_fs = datetime.fromtimestamp(stat.st_ctime).isoformat()
-        modified_fs = datetime.fromtimestamp(stat.st_mtime).isoformat()
+    def _listed_files(self, relative_dir):
+        """
+        Known rows of the files present at the directory's last full
+        listing (those seen by that scan or a later one).
+        """
 
-        header_valid = 1
-        sha256 = None
+        listed_scan_id = self.known_dirs[relative_dir][2]
 
-        if is_valid_audio(full_path):
-            self.audio_files += 1
+        return [
+            known for known in self.known_dir_files.get(relative_dir, ())
+            if known[6] >= listed_scan_id
+        ]
+
+    def _can_prune(self, relative_dir, mtime, child_count):
+        """
+        Walk-stage callback (skip mode, unless deep_verify): True when
+        the directory is unchanged since its last full listing and none
+        of its files needs reprocessing. Its files are then served from
+        the known rows instead of being stat'ed.
+        """
+
+        state = self.known_dirs.get(relative_dir)
+
+        if state is None or state[0] != mtime or state[1] != child_count:
+            return False
+
+        return not any(self._needs_reprocess(known) for known in self._listed_files(relative_dir))
+
+    # --------------------------------------------------
+    # Classify Stage
+    # --------------------------------------------------
+
+    def _classify_stage(self, records):
+        """
+        Turns crawler records into jobs. Unchanged files in skip mode
+        become touch-only jobs that pass through the read stages, as do
+        the files of pruned directories.
+        """
+
+        for record in records:
+
+            if isinstance(record, DirRecord):
+                yield from self._classify_directory(record)
+                continue
+
+            try:
+                yield self._classify_file(record)
+
+            except Exception as e:
+                logging.error(f"File processing failed: {record.full_path} | {e}")
+                self.incomplete_dirs.add(_parent_dir(record.relative_path))
+
+    def _classify_directory(self, record):
+
+        if record.pruned:
+            for known in self._listed_files(record.relative_dir):
+                yield {
+                    "skip": True,
+                    "status": "served",
+                    "file_id": known[0],
+                    "header_valid": known[3],
+                    "size_bytes": known[1]
+                }
+
+        # Follows the directory's files to the write stage, which records
+        # its state and moves the checkpoint
+        yield {"skip": True, "directory": record}
+
+    def _classify_file(self, record):
+
+        relative_path = record.relative_path
+        size_bytes = record.size_bytes
+        created_fs = datetime.fromtimestamp(record.ctime).isoformat()
+        modified_fs = datetime.fromtimestamp(record.mtime).isoformat()
+
+        known = self.known_files.get(relative_path)
+
+        if known and self._can_skip(known, size_bytes, modified_fs):
+            return {
+                "skip": True,
+                "status": "skipped",
+                "file_id": known[0],
+                "header_valid": known[3],
+                "size_bytes": size_bytes
+            }
+
+        return {
+            "skip": False,
+            "status": "reprocessed" if known else "new",
+            "full_path": record.full_path,
+            "known": known,
+            "failed": False,
+            "file_id": known[0] if known else None,
+            "drive_id": self.drive_id,
+            "relative_path": relative_path,
+            "file_name": record.file_name,
+            "extension": os.path.splitext(record.file_name)[1].lower(),
+            "size_bytes": size_bytes,
+            "inode": record.inode,
+            "created_fs": created_fs,
+            "modified_fs": modified_fs,
+            "header_valid": 0,
+            "sha256": None,
+            "partial_hash": None,
+            "hash_algo": None,
+            "audio_payload_hash": None,
+            "flac_md5": None,
+            "metadata": None,
+            "metadata_cached": bool(
+                self.metadata_cache and known and self._has_reusable_metadata(known) and
+                self._is_unchanged(known, size_bytes, modified_fs)
+            ),
+            "tag_regions": None,
+            "bytes_read": 0
+        }
+
+    # --------------------------------------------------
+    # Hash Stage (runs on hash workers)
+    # --------------------------------------------------
+
+    def _read_file(self, job):
+        """
+        Fills in header_valid, hashes and the tag regions for the
+        metadata stage; must not touch scanner counters or the database.
+        """
+
+        if job["skip"] or not is_extension_allowed(job["file_name"]):
+            return job
+
+        full_path = job["full_path"]
+
+        try:
+            # One open serves header check, hashing and tag regions
+            with FileContext(full_path, job["size_bytes"], self.reader) as ctx:
+
+                if ctx.is_valid_audio():
+                    job["header_valid"] = 1
+                    job["flac_md5"] = flac_streaminfo_md5(ctx.head)
+
+                    if not self.test_mode:
+                        job["partial_hash"], job["sha256"] = ctx.compute_hashes(
+                            self._wants_full_hash(job["flac_md5"]), self.hash_algo
+                        )
+                        job["audio_payload_hash"] = ctx.payload_hash
+                        if job["partial_hash"] is not None:
+                            job["hash_algo"] = self.hash_algo
+
+                    known = job["known"]
+                    if job["sha256"] is None and known and known[4] is not None and \
+                            job["hash_algo"] in (None, known[7]) and \
+                            self._is_unchanged(known, job["size_bytes"], job["modified_fs"]):
+                        # Keep a full hash computed earlier (e.g. by the
+                        # collision pass), if it is in this row's algorithm
+                        job["sha256"] = known[4]
+                        job["hash_algo"] = known[7]
+                        job["audio_payload_hash"] = known[8]
+
+                    # Extract metadata only for valid audio, unless the
+                    # unchanged row already has it
+                    if self.extract_metadata and not job["metadata_cached"]:
+                        job["tag_regions"] = ctx.tag_regions()
+
+                job["bytes_read"] = ctx.bytes_read
+
+        except OSError as e:
+            logging.error(f"Header validation failed for {full_path}: {e}")
+
+        except Exception as e:
+            logging.error(f"File processing failed: {full_path} | {e}")
+            job["failed"] = True
+
+        return job
+
+    # --------------------------------------------------
+    # Metadata Stage
+    # --------------------------------------------------
+
+    def _metadata_stage(self, jobs):
+        """
+        In-thread tag parsing, used when no metadata process pool is
+        configured.
+        """
+
+        for job in jobs:
+            if job.get("tag_regions"):
+                with HeadTailFile(job["full_path"], job["size_bytes"], *job["tag_regions"],
+                                  read_limit=self.tag_read_limit) as tag_file:
+                    job["metadata"] = extract_audio_metadata(job["full_path"], tag_file)
+                job["tag_regions"] = None
+
+            yield job
 
-            header_valid = 1
+    # --------------------------------------------------
+    # Write Stage (sole database user while scanning)
+    # --------------------------------------------------
+
+    def _write_stage(self, jobs):
+
+        with self.writer:
+            for job in jobs:
+                self._write_file(job)
+                yield job
+
+    def _write_file(self, job):
+
+        if "directory" in job:
+            self._write_directory(job["directory"])
+            return
 
-            sha256 = compute_sha256(full_path, self.test_mode)
+        if job["skip"]:
+            self.writer.touch_file(job["file_id"])
 
+        elif job["failed"]:
+            self.incomplete_dirs.add(_parent_dir(job["relative_path"]))
+            return
+
+        else:
+            self.writer.add_file(job)
+
+        self.total_files += 1
+
+        status = job["status"]
+        if status == "new":
+            self.new_files += 1
+        elif status == "reprocessed":
+            self.reprocessed_files += 1
         else:
-            header_valid = 0
-
-        file_id = self.db.upsert_file(
-            drive_id=self.drive_id,
-            relative_path=relative_path,
-            file_name=file_name,
-            extension=os.path.splitext(file_name)[1].lower(),
-            size_bytes=size_bytes,
-            created_fs=created_fs,
-            modified_fs=modified_fs,
-            header_valid=header_valid,
-            sha256=sha256
-        )
-
-        self.db.insert_path_components(file_id, relative_path)
-
-        # Extract metadata only for valid audio
-        if header_valid and self.extract_metadata:
-            metadata = extract_audio_metadata(full_path)
-            if metadata:
-                self.db.upsert_audio_metadata(file_id, metadata)
-
-        self.total_bytes += size_bytes
+            self.skipped_files += 1
+            if status == "served":
+                self.served_files += 1
+
+        if job["header_valid"]:
+            self.audio_files += 1
+
+            if not job["skip"] and self.extract_metadata:
+                self.metadata_lookups += 1
+                self.metadata_cache_hits += job["metadata_cached"]
+
+            if job.get("metadata") and job["metadata"].get("estimated"):
+                self.estimated_metadata += 1
+
+        if job.get("flac_md5"):
+            self.flac_md5_files += 1
+
+        self.total_bytes += job["size_bytes"]
 
         if self.total_files % 100 == 0:
             logging.info(f"Processed {self.total_files} files...")
 
+    def _write_directory(self, record):
+
+        if record.pruned:
+            self.pruned_dirs += 1
+
+        if not record.listed:
+            self.unlisted_dirs += 1
+
+        # Every file of this directory has reached the writer
+        self.checkpoint_dir = record.relative_dir
+        self.checkpoint_counters = {name: getattr(self, name) for name in _CHECKPOINT_COUNTERS}
+
+        # A directory with a failed file is listed in full next time
+        if not record.pruned and record.complete and record.relative_dir not in self.incomplete_dirs:
+            self.writer.add_directory(self.drive_id, record.relative_dir,
+                                      record.mtime, record.child_count)
+
+    # --------------------------------------------------
+    # Skip Mode
+    # --------------------------------------------------
+
+    @staticmethod
+    def _is_unchanged(known, size_bytes, modified_fs):
+        return known[1] == size_bytes and known[2] == modified_fs
+
+    def _can_skip(self, known, size_bytes, modified_fs):
+        """
+        Skip-mode check against the pre-loaded snapshot.
+
+        A file is skipped only when size and mtime are unchanged. Audio
+        rows missing a hash this run would compute (e.g. rows stored by
+        a test-mode run, or a first --compute-full-hash run) are
+        reprocessed. Rows hashed with another algorithm are kept as they
+        are (see HashMigrationPass).
+        """
+
+        if self.rescan_mode != "skip":
+            return False
+
+        if not self._is_unchanged(known, size_bytes, modified_fs):
+            return False
+
+        return not self._needs_reprocess(known)
+
+    def _needs_reprocess(self, known):
+        known_header_valid, known_sha256, known_partial_hash = known[3:6]
+        known_flac_md5 = known[9]
+
+        if known_header_valid and not self.test_mode:
+            if known_partial_hash is None:
+                return True
+            if known_sha256 is None and (self._wants_full_hash(known_flac_md5) or
+                                         known[1] <= PARTIAL_HASH_SIZE):
+                # Small files get full and payload hashes on every read
+                return True
+
+        return False
+
+    def _has_reusable_metadata(self, known) -> bool:
+        """
+        True when the row has metadata this scan may keep. With
+        metadata_cache, an unchanged file with such a row is not parsed
+        again and its metadata row is not rewritten, even when it is
+        reprocessed (force mode, missing hashes). Estimated metadata is
+        only kept by fast scans.
+        """
+
+        metadata_estimated = known[10]
+
+        if metadata_estimated is None:
+            return False
+
+        return not metadata_estimated or self.metadata_mode == "fast"
+
+    def _wants_full_hash(self, flac_md5) -> bool:
+        """
+        With compute_full_hash, FLACs carrying a STREAMINFO MD5 are
+        matched on it and only read in full with flac_full_hash.
+        """
+
+        return self.compute_full_hash and (self.flac_full_hash or flac_md5 is None)
+
     # --------------------------------------------------
     # Summary
     # --------------------------------------------------
@@ -114,7 +607,54 @@ class Scanner:
     def _print_summary(self):
 
         logging.info("========== SCAN SUMMARY ==========")
+        logging.info(f"Drive root          : {self.drive_root}")
         logging.info(f"Total files scanned : {self.total_files}")
         logging.info(f"Audio files found   : {self.audio_files}")
+        logging.info(f"FLAC STREAMINFO MD5 : {self.flac_md5_files} new/reprocessed files"
+                     f"{'' if self.flac_full_hash else ' (not full-hashed)'}")
+        logging.info(f"New files           : {self.new_files}")
+        logging.info(f"Reprocessed files   : {self.reprocessed_files}")
+        logging.info(f"Skipped (unchanged) : {self.skipped_files}")
+        logging.info(f"Pruned directories  : {self.pruned_dirs} "
+                     f"({self.served_files} files served from DB)")
+        logging.info(f"Missing files       : {self.missing_files}")
+        logging.info(f"Unlisted directories: {self.unlisted_dirs}")
+        logging.info(f"Metadata cache      : {self._metadata_cache_summary()}")
+        logging.info(f"Metadata mode       : {self.metadata_mode} "
+                     f"({self.estimated_metadata} estimated)")
         logging.info(f"Total size scanned  : {human_readable_size(self.total_bytes)}")
+        logging.info(f"Hash workers        : {self.hash_workers} ({self.hash_algo})")
+        logging.info(f"Read order          : "
+                     f"{self.read_scheduler.describe() if self.read_scheduler else 'walk order'}")
+        logging.info(f"Read throughput     : {human_readable_size(self.read_throughput())}/s "
+                     f"(in read calls: {human_readable_size(self.reader.bytes_per_second())}/s)")
+        logging.info(f"Read chunk size     : {human_readable_size(self.reader.sizer.chunk_size)} (adaptive)")
+        logging.info(f"Page cache hints    : {'fadvise' if self.reader.fadvise else 'off'}")
+        logging.info(f"DB batch commits    : {self.writer.flush_count}")
+        logging.info("---------- STAGE STATS -----------")
+        self.pipeline.log_stats()
         logging.info("==================================")
+
+    def _metadata_cache_summary(self) -> str:
+        if not self.metadata_cache:
+            return "off"
+
+        if not self.metadata_lookups:
+            return "no lookups"
+
+        hit_rate = 100 * self.metadata_cache_hits / self.metadata_lookups
+        return (f"{self.metadata_cache_hits}/{self.metadata_lookups} hits ({hit_rate:.1f}%), "
+                f"{self.metadata_lookups - self.metadata_cache_hits} parsed")
+
+
+def _parent_dir(relative_path: str) -> str:
+    return relative_path.rpartition("/")[0]
+
+
+# Scanner attributes saved with every checkpoint and restored on resume
+_CHECKPOINT_COUNTERS = (
+    "total_files", "new_files", "reprocessed_files", "skipped_files",
+    "served_files", "pruned_dirs", "unlisted_dirs", "audio_files", "flac_md5_files",
+    "metadata_lookups", "metadata_cache_hits", "estimated_metadata", "total_bytes"
+)
+
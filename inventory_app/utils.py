@@ -1,5 +1,8 @@
 import os
+import signal
 import logging
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 from config import LOG_DIR, LOG_FILE
 
@@ -54,3 +57,31 @@ def human_readable_size(size_bytes: int) -> str:
         size /= 1024
 
     return f"{size:.2f} EB"
+
+
+# --------------------------------------------------
+# Signals
+# --------------------------------------------------
+
+@contextmanager
+def sigterm_as_interrupt():
+    """
+    Turns SIGTERM into KeyboardInterrupt inside the block, so both
+    signals take the same path (a scan stops its stages, flushes and
+    marks the run interrupted). Signal handlers can only be set from the
+    main thread; elsewhere this does nothing.
+    """
+
+    if threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def handler(signum, frame):
+        raise KeyboardInterrupt(f"signal {signum}")
+
+    previous = signal.signal(signal.SIGTERM, handler)
+
+    try:
+        yield
+    finally:
+        signal.signal(signal.SIGTERM, previous)